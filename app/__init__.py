@@ -2,27 +2,42 @@ __all__ = ['mod_auth', 'mod_base', 'mod_calendar']
 
 from flask import (
     Flask,
+    Response,
+    abort,
     render_template,
+    request,
     current_app,
-    send_from_directory,
     redirect,
-    jsonify
+    jsonify,
+    has_app_context
 )
-from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect
+import hmac
 import os
 import re
+import threading
+from functools import lru_cache, wraps
 
 from app.mod_auth.auth import AuthError
+from app import profiling, timing
+from app.assets import Assets
+from app.compression import Compressor
+from app.sessions import ServerSideSessions
+from app.static_store import StaticStore
 
 
+URLS_REGEX = re.compile(
+    r"(https?\:\/\/[\w/\-?=%.]+\.[\w/\+\-?=%.~&\[\]\#]+)")
+DECORATED_URL_FORMAT = '<a href="{}" target="_blank">{}</a>'
+# Distinct task details kept already decorated
+TASK_DETAILS_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=TASK_DETAILS_CACHE_SIZE)
 def task_details_for_markup(details):
-    URLS_REGEX_PATTERN = r"(https?\:\/\/[\w/\-?=%.]+\.[\w/\+\-?=%.~&\[\]\#]+)"
-    DECORATED_URL_FORMAT = '<a href="{}" target="_blank">{}</a>'
     decorated_fragments = []
-    fragments = re.split(URLS_REGEX_PATTERN, details)
+    fragments = URLS_REGEX.split(details)
     for index, fragment in enumerate(fragments):
         if index % 2 == 1:
             decorated_fragments.append(
@@ -33,6 +48,21 @@ def task_details_for_markup(details):
     return "".join(decorated_fragments)
 
 
+'''
+tasks_details_for_markup(tasks)
+    decorates the details of all the tasks of a response at once, every
+    distinct text only once. Returns a dict details -> markup, and leaves
+    the filter cache warm for the rendering of the task occurrences.
+'''
+
+
+def tasks_details_for_markup(tasks):
+    return {
+        details: task_details_for_markup(details)
+        for details in {task['details'] for task in tasks}
+    }
+
+
 '''
 setup_db(app)
     binds a flask application and a SQLAlchemy service
@@ -43,10 +73,49 @@ def setup_db(app, database_path, track_modifications=False):
     if database_path:
         app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = track_modifications
+    db = get_db()
     db.app = app
     db.init_app(app)
 
 
+'''
+get_db()
+    the database object, created on first use
+'''
+
+
+def get_db():
+    global _db
+    if _db is None:
+        from flask_sqlalchemy import SQLAlchemy
+
+        with _db_lock:
+            if _db is None:
+                _db = SQLAlchemy()
+    return _db
+
+
+'''
+init_db(app)
+    binds the database object and Flask-Migrate to app. Done by create_app,
+    or in LAZY_INIT mode on first use of app.db, which must then happen
+    before the first request (shell, scripts): Flask-SQLAlchemy and
+    Flask-Migrate are only imported then.
+'''
+
+
+def init_db(app):
+    db = get_db()
+    with _db_lock:
+        if 'migrate' not in app.extensions:
+            from flask_migrate import Migrate
+
+            setup_db(app, os.environ.get('DATABASE_URL'))
+            # Create the Flask-Migrate object
+            Migrate(app, db)
+    return db
+
+
 '''
 create_app(config)
     creates the flask application
@@ -65,6 +134,11 @@ def create_app(config='config'):
     app.config.from_object(config)
     app.config['CORS_HEADERS'] = 'Content-Type'
     csrf.init_app(app)
+    # Built before the static files are loaded and precompressed
+    Assets(app)
+    StaticStore(app)
+    Compressor(app)
+    timing.init_app(app)
 
     if 'API_URL' in os.environ:
         # Use the API_URL environment varible on Heroku.
@@ -74,13 +148,21 @@ def create_app(config='config'):
         # It must be a constant value to allow the session
         # to be persistent.
         app.config['SECRET_KEY'] = os.environ['SECRET_KEY']
+    # Also sets a SECRET_KEY shared by the workers when there is none
+    ServerSideSessions(app)
+    if 'PROFILING_SECRET' in os.environ:
+        # Value of the X-Profile header of the requests to profile
+        app.config['PROFILING_SECRET'] = os.environ['PROFILING_SECRET']
+    if 'STATS_SECRET' in os.environ:
+        # Value of the X-Stats header of the requests to /stats/
+        app.config['STATS_SECRET'] = os.environ['STATS_SECRET']
 
-    if 'DATABASE_URL' in os.environ:
-        database_path = os.environ['DATABASE_URL']
-    else:
-        database_path = None
-    setup_db(app, database_path)
+    # The flask command line (flask db ...) needs Flask-Migrate right away
+    if not app.config.get('LAZY_INIT', False) or \
+            os.environ.get('FLASK_RUN_FROM_CLI'):
+        init_db(app)
     CORS(app)
+    profiling.init_app(app)
 
     # Import a module / component using its blueprint handler
     # variable (mod_auth)
@@ -96,14 +178,76 @@ def create_app(config='config'):
         return redirect("/calendar/", code=302)
 
     # To avoid main_calendar_action below shallowing favicon requests
-    # and generating error logs
+    # and generating error logs. Served by the static view, from memory
+    # when the static store is enabled.
     @app.route("/favicon.ico")
     def favicon():
-        send_from_directory(
-            os.path.join("static", "ico"),
-            "favicon.ico",
-            mimetype="image/vnd.microsoft.icon",
-        )
+        return app.view_functions['static'](filename='ico/favicon.ico')
+
+    if 'compressor' in app.extensions:
+        # Precompressed at startup like the files of the static view
+        app.extensions['compressor'].add_static_route(
+            'favicon', 'ico/favicon.ico')
+
+    stats_secret = app.config.get('STATS_SECRET')
+    if app.config.get('STATS_ENABLED', False) and not stats_secret:
+        print("Statistics disabled: STATS_SECRET is not set")
+    elif app.config.get('STATS_ENABLED', False):
+        from app.mod_auth.auth import token_cache
+        from app.mod_calendar.api_client import pool_stats
+        from app.mod_calendar.response_cache import get_response_cache
+
+        # The statistics are not public: not found without the secret
+        def stats_view(view):
+            @wraps(view)
+            def wrapper():
+                if not hmac.compare_digest(
+                        request.headers.get('X-Stats', '').encode(),
+                        stats_secret.encode()):
+                    abort(404)
+                return view()
+            return wrapper
+
+        # Backend connection pool usage (reuse rate, wait time) of this
+        # worker process
+        @app.route('/stats/api-pool', methods=['GET'])
+        @stats_view
+        def api_pool_stats():
+            return jsonify(pool_stats(app))
+
+        # Verified JWT cache hits and misses of this worker process
+        @app.route('/stats/token-cache', methods=['GET'])
+        @stats_view
+        def token_cache_stats():
+            return jsonify(token_cache.stats())
+
+        # Backend response cache hits, misses and evictions
+        @app.route('/stats/response-cache', methods=['GET'])
+        @stats_view
+        def response_cache_stats():
+            return jsonify(get_response_cache(app).stats())
+
+        # Server-side sessions of the session store
+        @app.route('/stats/session-store', methods=['GET'])
+        @stats_view
+        def session_store_stats():
+            sessions = app.extensions.get('sessions')
+            return jsonify(sessions.store.stats() if sessions else {})
+
+        # Static files served from memory or memory maps
+        @app.route('/stats/static-store', methods=['GET'])
+        @stats_view
+        def static_store_stats():
+            store = app.extensions.get('static_store')
+            return jsonify(store.stats() if store is not None else {})
+
+    if app.config.get('TIMING_ENABLED', False):
+        # Request phase histograms of this worker process, in the
+        # Prometheus text format
+        @app.route('/metrics', methods=['GET'])
+        def metrics():
+            return Response(timing.metrics.exposition(),
+                            mimetype='text/plain; version=0.0.4')
 
     # CORS Headers
     @app.after_request
@@ -133,15 +277,30 @@ def create_app(config='config'):
             "message": error.error['description']
         }), error.status_code
 
-    # Create the Flask-Migrate object
-    migrate = Migrate(app, db)
-
     return app
 
 
-# Define the database object which is imported
-# by modules and controllers
-db = SQLAlchemy()
+# The database object, imported by modules and controllers as app.db
+_db = None
+_db_lock = threading.Lock()
+_app_lock = threading.RLock()
+
+
+'''
+The app, and the database object, are created on first access to app.app
+and app.db, so importing a module of the package (benchmarks, stubs) does
+not build the whole application.
+'''
+
 
-# Create the app
-app = create_app()
+def __getattr__(name):
+    if name == 'app':
+        with _app_lock:
+            if 'app' not in globals():
+                globals()['app'] = create_app()
+        return globals()['app']
+    if name == 'db':
+        if has_app_context():
+            return init_db(current_app._get_current_object())
+        return init_db(__getattr__('app'))
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -0,0 +1,276 @@
+""" Static asset pipeline
+
+Bundles the stylesheets and scripts of the layouts into fingerprinted
+files under static/dist, served with far-future immutable caching:
+
+    python app/assets.py            # bundle and fingerprint
+    python app/assets.py --vendor   # also download the third-party assets
+
+(run as a script: importing the app package would create the app). With
+ASSETS_BUILD_ON_STARTUP the bundles are rebuilt when the app starts.
+
+The third-party assets (Bootstrap, Font Awesome, jQuery, popper) are
+vendored under static/vendor by --vendor. Until they are, the bundles leave
+them out and the pages keep loading them from their CDNs, in order.
+"""
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+from urllib.request import urlopen
+
+from flask import request, url_for
+
+FONT_AWESOME_CDN = 'https://maxcdn.bootstrapcdn.com/font-awesome/4.7.0/'
+# Vendored file (relative to the static folder) -> CDN URL
+VENDOR_FILES = {
+    'vendor/bootstrap/css/bootstrap.min.css':
+        'https://stackpath.bootstrapcdn.com/bootstrap/4.5.0/css/'
+        'bootstrap.min.css',
+    'vendor/bootstrap/js/bootstrap.min.js':
+        'https://stackpath.bootstrapcdn.com/bootstrap/4.5.0/js/'
+        'bootstrap.min.js',
+    'vendor/font-awesome/css/font-awesome.min.css':
+        FONT_AWESOME_CDN + 'css/font-awesome.min.css',
+    'vendor/jquery/jquery-3.5.1.min.js':
+        'https://code.jquery.com/jquery-3.5.1.min.js',
+    'vendor/popper/popper.min.js':
+        'https://cdn.jsdelivr.net/npm/popper.js@1.16.0/dist/umd/'
+        'popper.min.js',
+}
+VENDOR_FILES.update(
+    ('vendor/font-awesome/fonts/' + name, FONT_AWESOME_CDN + 'fonts/' + name)
+    for name in ('fontawesome-webfont.eot', 'fontawesome-webfont.svg',
+                 'fontawesome-webfont.ttf', 'fontawesome-webfont.woff',
+                 'fontawesome-webfont.woff2', 'FontAwesome.otf'))
+
+# Bundle -> its files, in load order
+BUNDLES = {
+    'main.css': (
+        'vendor/bootstrap/css/bootstrap.min.css',
+        'vendor/font-awesome/css/font-awesome.min.css',
+        'css/layout.main.css',
+        'css/style.css',
+    ),
+    'form.css': (
+        'vendor/bootstrap/css/bootstrap.min.css',
+        'vendor/font-awesome/css/font-awesome.min.css',
+    ),
+    'vendor.js': (
+        'vendor/jquery/jquery-3.5.1.min.js',
+        'vendor/popper/popper.min.js',
+        'vendor/bootstrap/js/bootstrap.min.js',
+    ),
+}
+# Static files fingerprinted one by one
+FINGERPRINTED_DIRS = ('css', 'ico')
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+
+CSS_COMMENT_REGEX = re.compile(r'/\*(?!!).*?\*/', re.S)
+CSS_SPACES_REGEX = re.compile(r'\s+')
+CSS_PUNCTUATION_REGEX = re.compile(r'\s*([{};,])\s*')
+CSS_URL_REGEX = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def fingerprint(data):
+    return hashlib.sha1(data).hexdigest()[:12]
+
+
+def fingerprinted_name(filename, data):
+    root, extension = posixpath.splitext(filename)
+    return '%s.%s%s' % (root, fingerprint(data), extension)
+
+
+def minify_css(css):
+    css = CSS_COMMENT_REGEX.sub('', css)
+    css = CSS_SPACES_REGEX.sub(' ', css)
+    css = CSS_PUNCTUATION_REGEX.sub(r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def rebase_css_urls(css, source, target_dir):
+    """Relative url() of a stylesheet moved from source to target_dir."""
+    source_dir = posixpath.dirname(source)
+
+    def rebase(match):
+        quote, url = match.group(1), match.group(2)
+        if re.match(r'^(data:|[a-z]+://|/|#)', url):
+            return match.group(0)
+        path, suffix = re.match(r'^([^?#]*)(.*)$', url).groups()
+        path = posixpath.normpath(posixpath.join(source_dir, path))
+        return 'url(%s%s%s%s)' % (
+            quote, posixpath.relpath(path, target_dir), suffix, quote)
+
+    return CSS_URL_REGEX.sub(rebase, css)
+
+
+def _read(static_folder, filename):
+    with open(os.path.join(static_folder, filename), 'rb') as static_file:
+        return static_file.read()
+
+
+def _write(static_folder, filename, data):
+    # Written aside and renamed: other workers may be reading it
+    path = os.path.join(static_folder, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(descriptor, 'wb') as static_file:
+        static_file.write(data)
+    os.chmod(temporary, 0o644)
+    os.replace(temporary, path)
+
+
+def vendor(static_folder, timeout=30):
+    """Downloads the third-party assets that are not vendored yet."""
+    for filename, url in sorted(VENDOR_FILES.items()):
+        if os.path.exists(os.path.join(static_folder, filename)):
+            continue
+        print('Downloading %s' % url)
+        with urlopen(url, timeout=timeout) as response:
+            _write(static_folder, filename, response.read())
+
+
+def _write_bundle(static_folder, name, parts):
+    # Scripts are joined with ; in case one lacks the final one
+    data = (b'\n' if name.endswith('.css') else b';\n').join(parts)
+    bundle = posixpath.join(DIST_DIR, fingerprinted_name(name, data))
+    _write(static_folder, bundle, data)
+    return bundle
+
+
+def build_bundle(static_folder, name, files):
+    """Returns the URLs of a bundle in load order: fingerprinted bundles
+    of the local files, split around the CDN URLs of the assets that are
+    not vendored."""
+    urls = []
+    parts = []
+    for filename in files:
+        if not os.path.exists(os.path.join(static_folder, filename)):
+            if parts:
+                urls.append(_write_bundle(static_folder, name, parts))
+                parts = []
+            urls.append(VENDOR_FILES[filename])
+            continue
+        data = _read(static_folder, filename)
+        if name.endswith('.css'):
+            css = rebase_css_urls(data.decode('utf-8'), filename, DIST_DIR)
+            if not filename.endswith('.min.css'):
+                css = minify_css(css)
+            data = css.encode('utf-8')
+        parts.append(data)
+    if parts:
+        urls.append(_write_bundle(static_folder, name, parts))
+    return urls
+
+
+def build(static_folder):
+    manifest = {'bundles': {}, 'files': {}}
+    for name, files in sorted(BUNDLES.items()):
+        manifest['bundles'][name] = build_bundle(static_folder, name, files)
+    for directory in FINGERPRINTED_DIRS:
+        for filename in sorted(os.listdir(
+                os.path.join(static_folder, directory))):
+            filename = posixpath.join(directory, filename)
+            data = _read(static_folder, filename)
+            target = posixpath.join(
+                DIST_DIR, fingerprinted_name(filename, data))
+            _write(static_folder, target, data)
+            manifest['files'][filename] = target
+    _write(static_folder, posixpath.join(DIST_DIR, MANIFEST),
+           json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        return json.loads(_read(
+            static_folder, posixpath.join(DIST_DIR, MANIFEST)).decode())
+    except (OSError, ValueError):
+        return None
+
+
+'''
+Assets
+    url_for-compatible helpers of the templates:
+        static_url(filename): URL of a static file, fingerprinted if built
+        asset_urls(bundle): URLs to load for a bundle, the bundle itself
+            if it is built or else every file of it
+'''
+
+
+class Assets():
+    def __init__(self, app=None):
+        self.manifest = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if app.config.get('ASSETS_BUILD_ON_STARTUP', False):
+            self.manifest = build(app.static_folder)
+        else:
+            self.manifest = load_manifest(app.static_folder)
+        app.extensions['assets'] = self
+        app.jinja_env.globals.update(
+            static_url=self.static_url, asset_urls=self.asset_urls)
+        app.after_request(self.cache_fingerprinted)
+
+    @property
+    def version(self):
+        """Changes whenever a fingerprinted file does."""
+        return fingerprint(json.dumps(
+            self.manifest, sort_keys=True).encode())
+
+    def _url(self, filename):
+        if '://' in filename:
+            return filename
+        return url_for('static', filename=filename)
+
+    def static_url(self, filename):
+        if self.manifest is not None:
+            filename = self.manifest['files'].get(filename, filename)
+        return url_for('static', filename=filename)
+
+    def asset_urls(self, bundle):
+        if self.manifest is not None:
+            return [self._url(filename)
+                    for filename in self.manifest['bundles'][bundle]]
+        return [VENDOR_FILES.get(filename) or self._url(filename)
+                for filename in BUNDLES[bundle]]
+
+    def cache_fingerprinted(self, response):
+        filename = (request.view_args or {}).get('filename', '')
+        if request.endpoint == 'static' and \
+                filename.startswith(DIST_DIR + '/') and \
+                response.status_code in (200, 304):
+            # The name changes with the content: never revalidated
+            response.headers['Cache-Control'] = \
+                'public, max-age=31536000, immutable'
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vendor', action='store_true',
+                        help='download the third-party assets first')
+    parser.add_argument('--clean', action='store_true',
+                        help='remove the previous builds first')
+    args = parser.parse_args()
+    static_folder = os.path.join(os.path.dirname(__file__), 'static')
+    if args.clean:
+        shutil.rmtree(os.path.join(static_folder, DIST_DIR),
+                      ignore_errors=True)
+    if args.vendor:
+        vendor(static_folder)
+    manifest = build(static_folder)
+    for name, urls in sorted(manifest['bundles'].items()):
+        print('%-10s %s' % (name, ' '.join(urls)))
+    print('%d fingerprinted files' % len(manifest['files']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+import gzip
+import mimetypes
+import os
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Encodings by order of preference
+ENCODINGS = ('br', 'gzip')
+COMPRESSIBLE_MIMETYPES = (
+    'application/javascript',
+    'application/json',
+    'image/svg+xml',
+    'image/vnd.microsoft.icon',
+    'image/x-icon',
+    'text/css',
+    'text/html',
+    'text/javascript',
+    'text/plain'
+)
+
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level)
+
+
+def compress_stream(chunks, encoding, level):
+    """Compresses a streamed body chunk by chunk, flushing after every
+    chunk so the client can render what it got so far."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _encoded_chunks(chunks):
+    for chunk in chunks:
+        yield chunk.encode() if isinstance(chunk, str) else chunk
+
+
+'''
+Compressor
+    compresses the responses of the application with brotli (when the
+    brotli package is installed) or gzip, as the client accepts them.
+    Static files are compressed once at startup, at the highest levels,
+    and served from memory; pages are compressed per response, and
+    streamed pages chunk by chunk.
+'''
+
+
+class Compressor():
+    def __init__(self, app=None):
+        self.min_size = 500
+        self.level = 6
+        self.brotli_level = 4
+        self.encodings = ()
+        self.static_variants = {}
+        # Endpoints other than static serving a static file, by name
+        self.static_routes = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('COMPRESS_ENABLED', True):
+            return
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+        self.level = app.config.get('COMPRESS_LEVEL', 6)
+        self.brotli_level = app.config.get('COMPRESS_BROTLI_LEVEL', 4)
+        self.encodings = tuple(
+            encoding for encoding in ENCODINGS
+            if encoding != 'br' or brotli is not None)
+        self.static_variants = self.precompress_static(app.static_folder)
+        app.extensions['compressor'] = self
+        app.after_request(self.compress_response)
+
+    def precompress_static(self, folder):
+        """{filename: {encoding: bytes}} of the compressible static files,
+        only keeping the variants that are actually smaller."""
+        variants = {}
+        if not folder or not os.path.isdir(folder):
+            return variants
+        for root, _, files in os.walk(folder):
+            for name in files:
+                path = os.path.join(root, name)
+                mimetype = mimetypes.guess_type(name)[0]
+                if mimetype not in COMPRESSIBLE_MIMETYPES or \
+                        os.path.getsize(path) < self.min_size:
+                    continue
+                with open(path, 'rb') as static_file:
+                    data = static_file.read()
+                filename = os.path.relpath(path, folder).replace(os.sep, '/')
+                for encoding in self.encodings:
+                    compressed = compress(
+                        data, encoding, 11 if encoding == 'br' else 9)
+                    if len(compressed) < len(data):
+                        variants.setdefault(filename, {})[encoding] = \
+                            compressed
+        return variants
+
+    def add_static_route(self, endpoint, filename):
+        """Serves the precompressed variants of filename on endpoint."""
+        self.static_routes[endpoint] = filename
+
+    def static_filename(self):
+        if request.endpoint == 'static':
+            return (request.view_args or {}).get('filename')
+        return self.static_routes.get(request.endpoint)
+
+    def accepted_encoding(self, candidates):
+        accept_encodings = request.accept_encodings
+        for encoding in candidates:
+            if accept_encodings[encoding]:
+                return encoding
+        return None
+
+    def compress_response(self, response):
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES or \
+                response.status_code < 200 or \
+                response.status_code in (204, 206, 304) or \
+                'Content-Encoding' in response.headers or \
+                'no-transform' in response.headers.get('Cache-Control', ''):
+            return response
+
+        static_filename = self.static_filename()
+        if static_filename is not None:
+            variants = self.static_variants.get(static_filename)
+            if not variants:
+                return response
+            response.vary.add('Accept-Encoding')
+            encoding = self.accepted_encoding(
+                [encoding for encoding in self.encodings
+                 if encoding in variants])
+            if encoding is None:
+                return response
+            # Drop the file opened by send_file
+            response.close()
+            response.direct_passthrough = False
+            response.set_data(variants[encoding])
+        elif response.is_streamed:
+            response.vary.add('Accept-Encoding')
+            encoding = self.accepted_encoding(self.encodings)
+            if encoding is None:
+                return response
+            response.response = compress_stream(
+                _encoded_chunks(response.response), encoding,
+                self.brotli_level if encoding == 'br' else self.level)
+            response.headers.pop('Content-Length', None)
+        else:
+            if response.direct_passthrough or \
+                    response.calculate_content_length() < self.min_size:
+                return response
+            response.vary.add('Accept-Encoding')
+            encoding = self.accepted_encoding(self.encodings)
+            if encoding is None:
+                return response
+            response.set_data(compress(
+                response.get_data(), encoding,
+                self.brotli_level if encoding == 'br' else self.level))
+
+        response.headers['Content-Encoding'] = encoding
+        # The bytes differ from the identity representation
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
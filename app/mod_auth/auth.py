@@ -1,16 +1,30 @@
 import os
 import json
+import hashlib
+import threading
+import time
 from flask import request, _request_ctx_stack, session
+from collections import OrderedDict
 from functools import wraps
 from jose import jwt
 from urllib.request import urlopen, URLError
-from authlib.integrations.flask_client import OAuth
 import app.mod_auth.constants as constants
+from app.timing import timed
 
 
 AUTH0_DOMAIN = os.getenv('AUTH0_DOMAIN')
 ALGORITHMS = [os.getenv('ALGORITHMS')]
 API_AUDIENCE = os.getenv('API_AUDIENCE')
+# JWKS endpoint, overridable to point to a local stub server
+JWKS_URL = os.getenv(
+    'JWKS_URL', 'https://%s/.well-known/jwks.json' % AUTH0_DOMAIN)
+# Seconds before the cached signing keys are refreshed in the background
+JWKS_CACHE_TTL = int(os.getenv('JWKS_CACHE_TTL', 3600))
+# Minimum seconds between two fetches triggered by an unknown kid
+JWKS_MIN_REFRESH_INTERVAL = int(os.getenv('JWKS_MIN_REFRESH_INTERVAL', 30))
+JWKS_FETCH_TIMEOUT = int(os.getenv('JWKS_FETCH_TIMEOUT', 5))
+# Maximum number of verified tokens kept in memory
+JWT_CACHE_SIZE = int(os.getenv('JWT_CACHE_SIZE', 1024))
 
 # AuthError Exception
 '''
@@ -25,6 +39,184 @@ class AuthError(Exception):
         self.status_code = status_code
 
 
+'''
+JWKSCache
+    kid-indexed map of the signing keys published in the JWKS endpoint,
+    kept as the JWK dicts jwt.decode takes. When the TTL expires the keys
+    are refreshed in a background thread while the current copy keeps
+    being served, an unknown kid triggers one synchronous refetch, and if
+    the endpoint can not be reached the stale keys are used. Fetches,
+    failed or not, are at least min_refresh_interval seconds apart: a
+    down endpoint is not retried on every request.
+'''
+
+
+class JWKSCache():
+    def __init__(
+        self,
+        url,
+        ttl=JWKS_CACHE_TTL,
+        min_refresh_interval=JWKS_MIN_REFRESH_INTERVAL,
+        timeout=JWKS_FETCH_TIMEOUT
+    ):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self._keys = {}
+        self._fetched_at = None
+        self._attempted_at = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _fetch(self):
+        jsonurl = urlopen(self.url, timeout=self.timeout)
+        jwks = json.loads(jsonurl.read())
+        keys = {}
+        for key in jwks['keys']:
+            if 'kid' not in key:
+                continue
+            keys[key['kid']] = {
+                'kty': key['kty'],
+                'kid': key['kid'],
+                'use': key['use'],
+                'n': key['n'],
+                'e': key['e']
+            }
+        return keys
+
+    def _may_fetch(self):
+        return self._attempted_at is None or \
+            time.monotonic() - self._attempted_at >= \
+            self.min_refresh_interval
+
+    def refresh(self):
+        with self._lock:
+            self._attempted_at = time.monotonic()
+        try:
+            keys = self._fetch()
+        except (URLError, OSError, ValueError, KeyError) as e:
+            print(e)
+            return False
+        with self._lock:
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+        return True
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        finally:
+            self._refreshing = False
+
+    def get_key(self, kid):
+        if self._fetched_at is None:
+            with self._lock:
+                loaded = self._fetched_at is not None
+            if not loaded and not (self._may_fetch() and self.refresh()):
+                raise AuthError({
+                    'code': 'invalid_header',
+                    'description': 'Authorization malformed.'
+                }, 401)
+
+        age = time.monotonic() - self._fetched_at
+        if age > self.ttl and not self._refreshing and self._may_fetch():
+            with self._lock:
+                start_refresh = not self._refreshing
+                self._refreshing = True
+            if start_refresh:
+                threading.Thread(
+                    target=self._background_refresh, daemon=True).start()
+
+        key = self._keys.get(kid)
+        if key is None and self._may_fetch():
+            # The signing keys may have been rotated
+            self.refresh()
+            key = self._keys.get(kid)
+        return key
+
+    def clear(self):
+        with self._lock:
+            self._keys = {}
+            self._fetched_at = None
+            self._attempted_at = None
+
+
+jwks_cache = JWKSCache(JWKS_URL)
+
+
+'''
+TokenCache
+    bounded LRU cache of the payloads of already verified tokens, indexed
+    by the SHA-256 digest of the token. An entry is valid until the exp
+    claim of its token, so repeated requests with the same session skip
+    the RSA signature verification.
+'''
+
+
+class TokenCache():
+    def __init__(self, maxsize=JWT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(token):
+        if isinstance(token, str):
+            token = token.encode('utf-8')
+        return hashlib.sha256(token).hexdigest()
+
+    def get(self, token):
+        digest = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                expires_at, payload = entry
+                if time.time() < expires_at:
+                    self._entries.move_to_end(digest)
+                    self.hits += 1
+                    return payload
+                del self._entries[digest]
+            self.misses += 1
+        return None
+
+    def set(self, token, payload):
+        if self.maxsize <= 0 or 'exp' not in payload:
+            return
+        digest = self._digest(token)
+        with self._lock:
+            self._entries[digest] = (payload['exp'], payload)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token):
+        if not token:
+            return
+        with self._lock:
+            self._entries.pop(self._digest(token), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+token_cache = TokenCache()
+
+
 # Auth Header
 
 '''
@@ -105,7 +297,9 @@ def check_permissions(permission, payload):
         token: a json web token (string)
 
     it should be an Auth0 token with key id (kid)
-    it should verify the token using Auth0 /.well-known/jwks.json
+    it should verify the token using Auth0 /.well-known/jwks.json,
+    the keys are served from jwks_cache
+    tokens already verified are served from token_cache until they expire
     it should decode the payload from the token
     it should validate the claims
     return the decoded payload
@@ -116,34 +310,26 @@ def check_permissions(permission, payload):
 '''
 
 
+@timed('jwt')
 def verify_decode_jwt(token):
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+
     try:
-        jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-        jwks = json.loads(jsonurl.read())
-    except URLError as e:
-        print(e)
+        unverified_header = jwt.get_unverified_header(token)
+    except jwt.JWTError:
         raise AuthError({
             'code': 'invalid_header',
             'description': 'Authorization malformed.'
         }, 401)
-
-    unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
     if 'kid' not in unverified_header:
         raise AuthError({
             'code': 'invalid_header',
             'description': 'Authorization malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    rsa_key = jwks_cache.get_key(unverified_header['kid'])
     if rsa_key:
         try:
             payload = jwt.decode(
@@ -153,6 +339,7 @@ def verify_decode_jwt(token):
                 audience=API_AUDIENCE,
                 issuer='https://' + AUTH0_DOMAIN + '/'
             )
+            token_cache.set(token, payload)
             return payload
 
         except jwt.ExpiredSignatureError:
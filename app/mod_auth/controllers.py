@@ -1,6 +1,6 @@
 from six.moves.urllib.parse import urlencode
-from authlib.integrations.flask_client import OAuth
 import sys
+import threading
 from functools import wraps
 import json
 from dotenv import load_dotenv, find_dotenv
@@ -17,32 +17,76 @@ import app.mod_auth.auth as auth
 # Define the blueprint: 'auth', set its url prefix: app.url/auth
 mod_auth = Blueprint('auth', __name__, url_prefix='/auth')
 
-if constants.AUTH0_CALLBACK_URL not in env:
-    ENV_FILE = find_dotenv()
-    if ENV_FILE:
-        load_dotenv(ENV_FILE)
-
-AUTH0_CALLBACK_URL = env.get(constants.AUTH0_CALLBACK_URL)
-AUTH0_CLIENT_ID = env.get(constants.AUTH0_CLIENT_ID)
-AUTH0_CLIENT_SECRET = env.get(constants.AUTH0_CLIENT_SECRET)
-AUTH0_DOMAIN = env.get(constants.AUTH0_DOMAIN)
-AUTH0_BASE_URL = 'https://' + AUTH0_DOMAIN
-AUTH0_AUDIENCE = env.get(constants.AUTH0_AUDIENCE)
-
-
-oauth = OAuth(current_app)
-
-auth0 = oauth.register(
-    'auth0',
-    client_id=AUTH0_CLIENT_ID,
-    client_secret=AUTH0_CLIENT_SECRET,
-    api_base_url=AUTH0_BASE_URL,
-    access_token_url=AUTH0_BASE_URL + '/oauth/token',
-    authorize_url=AUTH0_BASE_URL + '/authorize',
-    client_kwargs={
-        'scope': 'openid profile email',
-    },
-)
+_auth0_settings = None
+_settings_lock = threading.Lock()
+_auth0_lock = threading.Lock()
+
+
+'''
+auth0_settings()
+    Auth0 settings from the environment, or from the .env file when the
+    environment does not have them. Read on first use.
+'''
+
+
+def auth0_settings():
+    global _auth0_settings
+    if _auth0_settings is None:
+        with _settings_lock:
+            if _auth0_settings is None:
+                if constants.AUTH0_CALLBACK_URL not in env:
+                    ENV_FILE = find_dotenv()
+                    if ENV_FILE:
+                        load_dotenv(ENV_FILE)
+                _auth0_settings = {
+                    'callback_url': env.get(constants.AUTH0_CALLBACK_URL),
+                    'client_id': env.get(constants.AUTH0_CLIENT_ID),
+                    'client_secret': env.get(constants.AUTH0_CLIENT_SECRET),
+                    'base_url': 'https://' + env.get(constants.AUTH0_DOMAIN),
+                    'audience': env.get(constants.AUTH0_AUDIENCE)
+                }
+    return _auth0_settings
+
+
+'''
+get_auth0(app)
+    the Auth0 OAuth client of an application. Registered with the blueprint,
+    or on first use when LAZY_INIT is set: Authlib is only imported then.
+'''
+
+
+def get_auth0(app=None):
+    app = app or current_app._get_current_object()
+    client = app.extensions.get('auth0')
+    if client is None:
+        with _auth0_lock:
+            client = app.extensions.get('auth0')
+            if client is None:
+                client = app.extensions['auth0'] = _register_auth0(app)
+    return client
+
+
+def _register_auth0(app):
+    from authlib.integrations.flask_client import OAuth
+
+    settings = auth0_settings()
+    return OAuth(app).register(
+        'auth0',
+        client_id=settings['client_id'],
+        client_secret=settings['client_secret'],
+        api_base_url=settings['base_url'],
+        access_token_url=settings['base_url'] + '/oauth/token',
+        authorize_url=settings['base_url'] + '/authorize',
+        client_kwargs={
+            'scope': 'openid profile email',
+        },
+    )
+
+
+@mod_auth.record_once
+def register_auth0(state):
+    if not state.app.config.get('LAZY_INIT', False):
+        get_auth0(state.app)
 
 
 @mod_auth.errorhandler(500)
@@ -56,6 +100,7 @@ def server_error(error):
 def callback_handling():
     try:
         # Handles response from token endpoint
+        auth0 = get_auth0()
         auth0.authorize_access_token()
         resp = auth0.get('userinfo')
         userinfo = resp.json()
@@ -77,20 +122,24 @@ def callback_handling():
 
 @mod_auth.route('/login')
 def login():
-    print('AUTH0_CALLBACK_URL: %s' % AUTH0_CALLBACK_URL)
-    return auth0.authorize_redirect(
-        audience=AUTH0_AUDIENCE,
-        redirect_uri=AUTH0_CALLBACK_URL)
+    settings = auth0_settings()
+    print('AUTH0_CALLBACK_URL: %s' % settings['callback_url'])
+    return get_auth0().authorize_redirect(
+        audience=settings['audience'],
+        redirect_uri=settings['callback_url'])
 
 
 @mod_auth.route('/logout')
 def logout():
-    # Clear session stored data
+    # Forget the verified token and clear session stored data
+    auth.token_cache.invalidate(session.get(constants.JWT_TOKEN))
     session.clear()
     # Redirect user to logout endpoint
+    settings = auth0_settings()
     params = {'returnTo': url_for(
-        'index', _external=True), 'client_id': AUTH0_CLIENT_ID}
-    return redirect(auth0.api_base_url + '/v2/logout?' + urlencode(params))
+        'index', _external=True), 'client_id': settings['client_id']}
+    return redirect(
+        settings['base_url'] + '/v2/logout?' + urlencode(params))
 
 
 @mod_auth.route('/dashboard')
@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+
+'''
+PoolStats
+    thread-safe counters describing how the backend connection pool is used
+'''
+
+
+class PoolStats():
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def record_wait(self, elapsed):
+        with self._lock:
+            self.waits += 1
+            self.wait_time += elapsed
+            self.max_wait_time = max(self.max_wait_time, elapsed)
+
+    def as_dict(self):
+        with self._lock:
+            reused = max(self.requests - self.connections, 0)
+            return {
+                'requests': self.requests,
+                'connections': self.connections,
+                'reused': reused,
+                'reuse_rate': (
+                    reused / self.requests if self.requests else 0.0),
+                'wait_time_total': self.wait_time,
+                'wait_time_avg': (
+                    self.wait_time / self.waits if self.waits else 0.0),
+                'wait_time_max': self.max_wait_time
+            }
+
+
+def _timed_pool_class(base, stats):
+    class TimedConnectionPool(base):
+        def _new_conn(self):
+            stats.record_connection()
+            return super()._new_conn()
+
+        def _get_conn(self, timeout=None):
+            started = time.perf_counter()
+            try:
+                return super()._get_conn(timeout=timeout)
+            finally:
+                stats.record_wait(time.perf_counter() - started)
+
+    return TimedConnectionPool
+
+
+class PooledAdapter(HTTPAdapter):
+    def __init__(self, stats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _timed_pool_class(HTTPConnectionPool, self.stats),
+            'https': _timed_pool_class(HTTPSConnectionPool, self.stats)
+        }
+
+
+'''
+ApiClient
+    keep-alive HTTP client used to talk to the calendar backend.
+    Connections are pooled per worker process, every call has a
+    (connect, read) timeout and idempotent verbs are retried with
+    exponential backoff. Headers are built per call so the Authorization
+    header of one user never leaks into the request of another one.
+    Batches of independent calls are sent concurrently by a bounded
+    thread pool (executor).
+'''
+
+
+class ApiClient():
+    def __init__(
+        self,
+        pool_connections=10,
+        pool_maxsize=10,
+        pool_block=False,
+        connect_timeout=3.05,
+        read_timeout=10,
+        max_retries=2,
+        retry_backoff=0.2,
+        fanout_workers=8
+    ):
+        self.pid = os.getpid()
+        self.fanout_workers = fanout_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.timeout = (connect_timeout, read_timeout)
+        self.stats = PoolStats()
+        self.session = requests.Session()
+        # The backend is stateless: never keep cookies between users
+        self.session.cookies.set_policy(
+            DefaultCookiePolicy(allowed_domains=[]))
+        # Retry's default method list only contains idempotent verbs
+        retries = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=retry_backoff,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False
+        )
+        adapter = PooledAdapter(
+            self.stats,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=retries
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            pool_connections=config.get('API_POOL_CONNECTIONS', 10),
+            pool_maxsize=config.get('API_POOL_MAXSIZE', 10),
+            pool_block=config.get('API_POOL_BLOCK', False),
+            connect_timeout=config.get('API_CONNECT_TIMEOUT', 3.05),
+            read_timeout=config.get('API_READ_TIMEOUT', 10),
+            max_retries=config.get('API_MAX_RETRIES', 2),
+            retry_backoff=config.get('API_RETRY_BACKOFF', 0.2),
+            fanout_workers=config.get('API_FANOUT_WORKERS', 8)
+        )
+
+    def request(self, method, url, data=None, headers=None, stream=False):
+        self.stats.record_request()
+        return self.session.request(
+            method,
+            url,
+            data=data,
+            headers=headers,
+            timeout=self.timeout,
+            stream=stream
+        )
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.fanout_workers,
+                        thread_name_prefix='api-fanout')
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+_client_lock = threading.Lock()
+
+
+'''
+get_api_client(app)
+    returns the ApiClient of the current worker process, creating it on
+    first use. A client inherited through fork() is discarded, sockets
+    can not be shared between gunicorn workers.
+'''
+
+
+def get_api_client(app):
+    client = app.extensions.get('api_client')
+    if client is None or client.pid != os.getpid():
+        with _client_lock:
+            client = app.extensions.get('api_client')
+            if client is None or client.pid != os.getpid():
+                client = ApiClient.from_config(app.config)
+                app.extensions['api_client'] = client
+    return client
+
+
+def pool_stats(app):
+    return get_api_client(app).stats.as_dict()
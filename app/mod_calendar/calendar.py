@@ -1,5 +1,6 @@
 import calendar
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 
 
 class Calendar():
@@ -14,10 +15,6 @@ class Calendar():
     def month_name(month):
         return Calendar.month_names()[month - 1]
 
-    @staticmethod
-    def set_first_weekday(weekday):
-        calendar.setfirstweekday(weekday)
-
     @staticmethod
     def weekdays(week_starting_day):
         weekdays_headers = ["MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN"]
@@ -42,17 +39,25 @@ class Calendar():
         today_date = datetime.date(datetime.now())
         return today_date.day, today_date.month, today_date.year
 
+    # Month grids never change: they are built once per
+    # (year, month, first_weekday) and shared as tuples, so they are safe
+    # to use from concurrent requests. The first week day is always given
+    # explicitly, the global setting of the calendar module is not used.
+
     @staticmethod
-    def month_days(year, month):
-        return calendar.Calendar(
-            calendar.firstweekday()
-        ).itermonthdates(year, month)
+    @lru_cache(maxsize=512)
+    def month_days(year, month, first_weekday):
+        return tuple(
+            calendar.Calendar(first_weekday).itermonthdates(year, month))
 
     @staticmethod
-    def month_days_with_weekday(year, month):
-        return calendar.Calendar(
-            calendar.firstweekday()
-        ).monthdayscalendar(year, month)
+    @lru_cache(maxsize=512)
+    def month_days_with_weekday(year, month, first_weekday):
+        return tuple(
+            tuple(week)
+            for week in calendar.Calendar(first_weekday).monthdayscalendar(
+                year, month)
+        )
 
     @staticmethod
     def previous_month_link(year, month, min_year, max_year):
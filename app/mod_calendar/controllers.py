@@ -1,23 +1,49 @@
 import sys
 import json
 import requests
+from collections import namedtuple
 from flask import (
     Blueprint,
+    Response,
     current_app,
+    get_flashed_messages,
     jsonify,
     redirect,
     render_template,
     request,
     session,
+    stream_with_context,
     flash
 )
 from flask_wtf import FlaskForm
+from flask_wtf.csrf import generate_csrf
 from wtforms import HiddenField
 from datetime import date, datetime, timedelta
 
+from app import tasks_details_for_markup
+from app.mod_calendar.api_client import get_api_client
 from app.mod_calendar.calendar import Calendar
+from app.mod_calendar.etags import (
+    client_has_page,
+    not_modified,
+    page_etag,
+    payload_digest,
+    record_payload,
+    with_etag
+)
+from app.mod_calendar.response_cache import (
+    CachedResponse,
+    get_response_cache
+)
 from app.mod_calendar.forms import CalendarForm, TaskForm
+from app.mod_calendar.decoding import StreamedResponse
+from app.mod_calendar.recurrence import place_task_stream, place_tasks
+from app.mod_calendar.timestamps import parse_backend_time
 import app.mod_auth.auth as auth
+import app.mod_calendar.decoding as decoding
+import app.mod_calendar.delta as delta
+import app.mod_calendar.occurrences as occurrences
+import app.timing as timing
 
 # Define the blueprint: 'auth', set its url prefix: app.url/auth
 mod_calendar = Blueprint('calendar', __name__, url_prefix='/calendar')
@@ -48,6 +74,31 @@ def server_error(error):
     return render_template('errors/500.html', error_msg=error), 500
 
 
+'''
+render_page(template_name, **context)
+    renders a page template, buffered or, when STREAM_TEMPLATES is set,
+    streamed to the client while it is being rendered so the layout header
+    is flushed before the day cells are produced.
+'''
+
+
+def render_page(template_name, **context):
+    app = current_app._get_current_object()
+    if not app.config.get('STREAM_TEMPLATES', False):
+        return render_template(template_name, **context)
+
+    # The session is saved with the response headers: anything the template
+    # stores in it (flashed messages, CSRF token) must happen now
+    get_flashed_messages()
+    generate_csrf()
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(template_name).stream(**context)
+    stream.enable_buffering(app.config.get('STREAM_BUFFER_SIZE', 20))
+    if timing.enabled:
+        stream = timing.timed_stream('render', stream)
+    return Response(stream_with_context(stream), mimetype='text/html')
+
+
 def get_jwt_token():
     token = None
     if 'jwt_token' in session:
@@ -55,28 +106,145 @@ def get_jwt_token():
     return token
 
 
-def api_request(
+def get_user_id():
+    profile = session.get('profile')
+    return profile['user_id'] if profile else None
+
+
+'''
+Keys of the cached backend GET responses. The first item is always the
+calendar the response belongs to (None for the list of calendars).
+'''
+
+
+def calendars_cache_key():
+    return (None, 'calendars')
+
+
+def calendar_cache_key(calendar_id):
+    return (calendar_id, 'calendar')
+
+
+def month_cache_key(calendar_id, year, month):
+    return (calendar_id, year, month)
+
+
+def invalidate_calendar_cache(calendar_id=None, calendars=True):
+    cache = get_response_cache(current_app)
+    if calendar_id is not None:
+        # Every month: recurrent tasks show up in all of them
+        if current_app.config.get('API_DELTA_SYNC', False):
+            # Kept to be synced: the next view only fetches the changes
+            cache.expire(calendar_id)
+        else:
+            cache.invalidate(calendar_id)
+    if calendars:
+        # Names and settings of the calendars are part of the list
+        cache.invalidate(None)
+
+
+'''
+BackendCall
+    one backend request, as api_request and api_requests take them. With
+    stream, a month response of at least API_STREAM_MIN_BYTES is decoded
+    while it is received (see StreamedResponse in decoding.py).
+'''
+BackendCall = namedtuple(
+    'BackendCall',
+    ['method', 'api', 'data', 'headers', 'cache_key', 'stream'])
+
+
+def backend_call(
     method,
     api,
     data=None,
-    headers={'content-type': 'application/json'}
+    headers=None,
+    cache_key=None,
+    stream=False
 ):
-    if get_jwt_token():
-        headers['Authorization'] = 'Bearer %s' % get_jwt_token()
-    else:
-        headers.pop('Authorization', None)
-    url = current_app.config["API_URL"] + 'api' + api
-    if method.upper() == 'GET':
-        response = requests.get(url=url, headers=headers).json()
-    elif method.upper() == 'POST':
-        response = requests.post(url=url, data=data, headers=headers).json()
-    elif method.upper() == 'PATCH':
-        response = requests.patch(url=url, data=data, headers=headers).json()
-    elif method.upper() == 'DELETE':
-        response = requests.delete(url=url, headers=headers).json()
+    return BackendCall(method.upper(), api, data, headers, cache_key, stream)
+
+
+def _prepare_request(call, stale=None):
+    request_headers = {'content-type': 'application/json'}
+    if call.headers:
+        request_headers.update(call.headers)
+    token = get_jwt_token()
+    if token:
+        request_headers['Authorization'] = 'Bearer %s' % token
+    url = current_app.config["API_URL"] + 'api' + call.api
+    stream_min_bytes = current_app.config.get('API_STREAM_MIN_BYTES', 0) \
+        if call.stream else 0
+    if _syncs(stale):
+        # Only the changes since the cached month, merged into it
+        url = delta.sync_url(url, stale.version)
+        stream_min_bytes = 0
+    elif stale is not None:
+        # Revalidation of an expired cached response
+        if stale.etag:
+            request_headers['If-None-Match'] = stale.etag
+        if stale.last_modified:
+            request_headers['If-Modified-Since'] = stale.last_modified
+    data = None if call.method in ('GET', 'DELETE') else call.data
+    return call.method, url, data, request_headers, stream_min_bytes
+
+
+def _syncs(stale):
+    return stale is not None and stale.version is not None and \
+        current_app.config.get('API_DELTA_SYNC', False)
+
+
+# _send_request result of a 304: the expired cached response is current
+NOT_MODIFIED = object()
+# Bytes read at a time from a streamed backend response
+API_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _send_request(client, method, url, data, headers, stream_min_bytes=0):
+    # Runs in the fan-out threads: no access to the request context
+    try:
+        response = client.request(
+            method, url, data=data, headers=headers,
+            stream=bool(stream_min_bytes))
+        if response.status_code == 304:
+            response.close()
+            return NOT_MODIFIED, None
+        # Without Content-Length (chunked), the body may be of any size
+        if stream_min_bytes and response.status_code == 200 and int(
+                response.headers.get('Content-Length', stream_min_bytes)
+        ) >= stream_min_bytes:
+            return StreamedResponse(
+                response.iter_content(API_STREAM_CHUNK_SIZE), 'tasks',
+                required=('calendar',), close=response.close), None
+        return CachedResponse(
+            decoding.loads(response.content),
+            payload_digest(response.content),
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified'),
+            response.headers.get(delta.VERSION_HEADER)
+        ), None
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return None, e
+
+
+def _handle_response(call, fetched, error, user, stale):
+    if error is not None:
+        print("Unexpected error:", repr(error))
+        return False, server_error('Backend not available')
+
+    if fetched is NOT_MODIFIED:
+        get_response_cache(current_app).refresh(user, call.cache_key)
+        record_payload(stale.digest)
+        return True, stale.response
+
+    if isinstance(fetched, StreamedResponse):
+        if fetched.fields.get('success', True) is not False:
+            # Not cached, and its digest is only known once the tasks
+            # are consumed: recorded by the caller
+            return True, fetched
+        response = fetched.fields
     else:
-        return False, server_error('Internal server error')
-
+        response = fetched.response
     if response.get('success', False) is False:
         if response.get('error', None) == 400:
             return False, permission_error('Permission denied')
@@ -88,20 +256,98 @@ def api_request(
             return False, unprocessable_entity_error('Unprocessable request')
         elif response.get('error', None) == 500:
             return False, server_error('Internal server error')
+    elif call.method == 'GET':
+        if stale is not None and delta.is_delta(response):
+            fetched = delta.merge_delta(stale, fetched)
+            response = fetched.response
+        if call.cache_key is not None:
+            get_response_cache(current_app).set(user, call.cache_key, fetched)
+        record_payload(fetched.digest)
     return True, response
 
 
+'''
+api_requests(calls)
+    issues a batch of backend calls concurrently and returns their
+    (ret, response) results in the same order. Errors are mapped to the
+    blueprint error handlers one by one, as api_request does.
+    Expired cached responses with validators are revalidated with a
+    conditional request: a 304 extends them without any body transferred.
+'''
+
+
+def api_requests(calls):
+    user = get_user_id()
+    cache = get_response_cache(current_app)
+    results = [None] * len(calls)
+    pending = []
+    for position, call in enumerate(calls):
+        if call.method not in ('GET', 'POST', 'PATCH', 'DELETE'):
+            results[position] = False, server_error('Internal server error')
+            continue
+        stale = None
+        if call.method == 'GET' and call.cache_key is not None:
+            cached = cache.get(user, call.cache_key)
+            if cached is not None:
+                record_payload(cached.digest)
+                results[position] = True, cached.response
+                continue
+            stale = cache.stale(user, call.cache_key)
+            if stale is not None and not (
+                    stale.etag or stale.last_modified or _syncs(stale)):
+                stale = None
+        pending.append(
+            (position, call, stale, _prepare_request(call, stale)))
+
+    client = get_api_client(current_app)
+    with timing.phase('api'):
+        if len(pending) > 1:
+            futures = [
+                client.executor.submit(_send_request, client, *prepared)
+                for _, _, _, prepared in pending
+            ]
+            outcomes = [future.result() for future in futures]
+        else:
+            outcomes = [
+                _send_request(client, *prepared)
+                for _, _, _, prepared in pending
+            ]
+
+    for (position, call, stale, _), (fetched, error) in zip(
+            pending, outcomes):
+        results[position] = _handle_response(
+            call, fetched, error, user, stale)
+    return results
+
+
+def api_request(
+    method,
+    api,
+    data=None,
+    headers=None,
+    cache_key=None,
+    stream=False
+):
+    return api_requests(
+        [backend_call(method, api, data, headers, cache_key, stream)])[0]
+
+
 @mod_calendar.route('/', methods=['GET'])
 def index():
-    ret, response = api_request('GET', '/calendars/')
+    ret, response = api_request(
+        'GET', '/calendars/', cache_key=calendars_cache_key())
     if ret is False:
         flash('No calendars found')
         return response
 
+    etag = page_etag(current_app)
+    if client_has_page(etag):
+        return not_modified(etag)
+
     class MyCSRFForm(FlaskForm):
         id = HiddenField('id')
 
-    return render_template(
+    return with_etag(render_template(
         'calendar/home.html',
         session=session,
         calendars=response['calendars'],
@@ -109,7 +355,7 @@ def index():
         api_url=current_app.config["API_URL"] + 'api',
         dashboard_link='/auth/dashboard',
         jwt=get_jwt_token()
-    )
+    ), etag)
 
 
 @mod_calendar.route('/<int:calendar_id>/', methods=['GET'])
@@ -118,43 +364,24 @@ def get_calendar_id(calendar_id):
     m = request.args.get('m', -1, type=int)
     if y != -1 and m != -1:
         ret, response = api_request(
-            'GET', '/calendars/%d/tasks/?y=%d&m=%d' % (calendar_id, y, m))
+            'GET', '/calendars/%d/tasks/?y=%d&m=%d' % (calendar_id, y, m),
+            cache_key=month_cache_key(calendar_id, y, m), stream=True)
     else:
         ret, response = api_request(
-            'GET', '/calendars/%d/tasks/' % calendar_id)
+            'GET', '/calendars/%d/tasks/' % calendar_id,
+            cache_key=month_cache_key(calendar_id, None, None))
     if ret is False:
         flash('Calendar %s not found' % calendar_id)
         return response
 
-    def _add_task_to_task_list(
-        tasks_list,
-        day,
-        month,
-        task,
-        view_past_tasks=True
-    ):
-        if not view_past_tasks:
-            # Check if this task should be hidden
-            start_time = datetime.now()
-            end_time = datetime.strptime(
-                task['end_time'], '%Y-%m-%d, %H:%M:%S')
-            task_end_time = datetime(
-                start_time.year,
-                month, day,
-                end_time.hour,
-                end_time.minute,
-                end_time.second
-            )
-            if task_end_time < start_time:
-                return
-        if month not in tasks_list:
-            tasks_list[month] = {}
-        if day not in tasks_list[month]:
-            tasks_list[month][day] = []
-        tasks_list[month][day].append(task)
+    streamed = None
+    if isinstance(response, StreamedResponse):
+        # The tasks are placed while they are received, the members after
+        # them (year, month) are not known yet
+        streamed = response
+        response = dict(streamed.fields, year=y, month=m)
 
     week_starting_day = response['calendar']['week_starting_day']
-    Calendar.set_first_weekday(week_starting_day)
 
     year = response['year']
     month = response['month']
@@ -162,46 +389,44 @@ def get_calendar_id(calendar_id):
     min_year = response['calendar']['min_year']
     max_year = response['calendar']['max_year']
     view_past_tasks = response['calendar']['hide_past_tasks']
-    month_days = Calendar.month_days(year, month)
+    month_days = Calendar.month_days(year, month, week_starting_day)
     weekdays_headers = Calendar.weekdays(week_starting_day)
 
-    tasks = {}
-    for task in response['tasks']:
-        if task['is_recurrent']:
-            monthly_repetition_done = False
-            for week in Calendar.month_days_with_weekday(year, month):
-                for weekday, day in enumerate(week):
-                    if day == 0:
-                        continue
-                    if task['repetition_type'] == 'w':
-                        # Weekly repetition: repetition_value is a week day
-                        if task['repetition_value'] == weekday:
-                            _add_task_to_task_list(
-                                tasks, day, month, task, view_past_tasks)
-                    elif task['repetition_type'] == 'm':
-                        if task['repetition_subtype'] == 'w':
-                            # Monthly repetition: repetition_value is a
-                            # week day
-                            if (
-                                task['repetition_value'] == weekday
-                                and not monthly_repetition_done
-                            ):
-                                _add_task_to_task_list(
-                                    tasks, day, month, task, view_past_tasks)
-                                monthly_repetition_done = True
-                        elif task['repetition_subtype'] == 'm':
-                            # Monthly repetition: repetition_value is a day
-                            if task['repetition_value'] == day:
-                                _add_task_to_task_list(
-                                    tasks, day, month, task, view_past_tasks)
+    with timing.phase('placement'):
+        if streamed is None:
+            tasks = place_tasks(
+                response['tasks'],
+                year,
+                month,
+                week_starting_day,
+                view_past_tasks
+            )
         else:
-            start_time = datetime.strptime(
-                task['start_time'], '%Y-%m-%d, %H:%M:%S')
-            task_day = start_time.day
-            task_month = start_time.month
-            _add_task_to_task_list(tasks, task_day, task_month, task)
-
-    return render_template(
+            try:
+                tasks = place_task_stream(
+                    streamed.elements,
+                    year,
+                    month,
+                    week_starting_day,
+                    view_past_tasks
+                )
+            except (requests.exceptions.RequestException, ValueError):
+                current_app.logger.exception("Streamed month not decoded")
+                return server_error('Backend not available')
+            record_payload(streamed.digest)
+
+    # Past occurrences only disappear as time goes by: for a given payload
+    # their number tells which ones are left
+    etag = page_etag(current_app, sum(
+        len(day_tasks) for days in tasks.values()
+        for day_tasks in days.values()))
+    if client_has_page(etag):
+        return not_modified(etag)
+
+    # The details of every task decorated once, not once per occurrence
+    details_markup = tasks_details_for_markup(_placed_tasks(tasks))
+
+    return with_etag(render_page(
         "calendar/calendar.html",
         session=session,
         calendar_id=response['calendar']['id'],
@@ -216,15 +441,184 @@ def get_calendar_id(calendar_id):
         next_month_link=Calendar.next_month_link(
             year, month, min_year, max_year),
         tasks=tasks,
+        details_markup=details_markup,
         display_view_past_button=response['calendar']['show_view_past_btn'],
         hide_past_tasks=response['calendar']['hide_past_tasks'],
         weekdays_headers=weekdays_headers,
         dashboard_link='/auth/dashboard',
         api_url=current_app.config["API_URL"] + 'api',
         jwt=get_jwt_token()
+    ), etag)
+
+
+# The distinct tasks of {month: {day: [tasks]}} as place_tasks returns them
+def _placed_tasks(*placed):
+    return {
+        task['id']: task for tasks in placed for days in tasks.values()
+        for day_tasks in days.values() for task in day_tasks
+    }.values()
+
+
+# Years of the month ranges: the month following the last one must stay
+# within the dates of datetime
+MIN_RANGE_YEAR = 1
+MAX_RANGE_YEAR = 9998
+
+
+def _month_range(year, month, count):
+    for _ in range(count):
+        yield year, month
+        month, year = Calendar.next_month_and_year(year=year, month=month)
+
+
+'''
+render_month_range(calendar_id, year, month, count)
+    compact view of count consecutive months. Only the backend fetches
+    run in parallel: the months are requested in one api_requests batch,
+    so the page waits about as long as the slowest call. The recurrences
+    of each month are then placed one month after another on the request
+    thread; place_tasks is pure Python and would not run faster on the
+    fan-out executor under the GIL.
+'''
+
+
+def _month_calls(calendar_id, year, month, count):
+    return [
+        backend_call(
+            'GET', '/calendars/%d/tasks/?y=%d&m=%d' % (calendar_id, y, m),
+            cache_key=month_cache_key(calendar_id, y, m))
+        for y, m in _month_range(year, month, count)
+    ]
+
+
+def render_month_range(calendar_id, year, month, count, year_view=False):
+    results = api_requests(_month_calls(calendar_id, year, month, count))
+    for ret, response in results:
+        if ret is False:
+            flash('Calendar %s not found' % calendar_id)
+            return response
+
+    calendar = results[0][1]['calendar']
+    week_starting_day = calendar['week_starting_day']
+    months = []
+    placed = []
+    for _, response in results:
+        month_year = response['year']
+        month_number = response['month']
+        with timing.phase('placement'):
+            tasks = place_tasks(
+                response['tasks'],
+                month_year,
+                month_number,
+                week_starting_day,
+                calendar['hide_past_tasks']
+            )
+        placed.append(tasks)
+        months.append({
+            'year': month_year,
+            'month': month_number,
+            'month_name': Calendar.month_name(month_number),
+            'weeks': Calendar.month_days_with_weekday(
+                month_year, month_number, week_starting_day),
+            # Only the days of the month itself are shown
+            'tasks': tasks.get(month_number, {})
+        })
+
+    # Warms the filter cache for the month pages the range links to
+    details_markup = tasks_details_for_markup(_placed_tasks(*placed))
+
+    previous_link = next_link = ''
+    if year_view:
+        if year > calendar['min_year']:
+            previous_link = '/calendar/%d/year/%d' % (calendar_id, year - 1)
+        if year < calendar['max_year']:
+            next_link = '/calendar/%d/year/%d' % (calendar_id, year + 1)
+
+    return render_page(
+        "calendar/months.html",
+        session=session,
+        calendar_id=calendar['id'],
+        calendar_name=calendar['name'],
+        year=year,
+        year_view=year_view,
+        months=months,
+        details_markup=details_markup,
+        current_date=datetime.date(datetime.now()),
+        previous_link=previous_link,
+        next_link=next_link,
+        weekdays_headers=Calendar.weekdays(week_starting_day),
+        dashboard_link='/auth/dashboard'
     )
 
 
+@mod_calendar.route('/<int:calendar_id>/year/<int:year>', methods=['GET'])
+def get_calendar_year(calendar_id, year):
+    if not MIN_RANGE_YEAR <= year <= MAX_RANGE_YEAR:
+        return unprocessable_entity_error('Year %d out of range' % year)
+    return render_month_range(calendar_id, year, 1, 12, year_view=True)
+
+
+def _range_arguments(default_count):
+    _, current_month, current_year = Calendar.current_date()
+    year = max(min(request.args.get('y', current_year, type=int),
+                   MAX_RANGE_YEAR), MIN_RANGE_YEAR)
+    month = max(min(request.args.get('m', current_month, type=int), 12), 1)
+    count = request.args.get('n', default_count, type=int)
+    max_count = min(current_app.config.get('MAX_RANGE_MONTHS', 12),
+                    (MAX_RANGE_YEAR - year) * 12 + 13 - month)
+    return year, month, max(min(count, max_count), 1)
+
+
+@mod_calendar.route('/<int:calendar_id>/months', methods=['GET'])
+def get_calendar_months(calendar_id):
+    return render_month_range(calendar_id, *_range_arguments(3))
+
+
+'''
+get_calendar_occurrences(calendar_id)
+    the tasks of n months (1 by default) from y/m, placed as on the month
+    page, as compact JSON (see occurrences.py) for the pages rendering
+    the months on the client. Revalidated with ETags like the pages.
+'''
+
+
+@mod_calendar.route('/<int:calendar_id>/occurrences.json', methods=['GET'])
+def get_calendar_occurrences(calendar_id):
+    year, month, count = _range_arguments(1)
+    results = api_requests(_month_calls(calendar_id, year, month, count))
+    for ret, response in results:
+        if ret is False:
+            return jsonify({
+                'success': False,
+                'error': response[1]
+            }), response[1]
+
+    calendar = results[0][1]['calendar']
+    months = []
+    for _, response in results:
+        with timing.phase('placement'):
+            tasks = place_tasks(
+                response['tasks'],
+                response['year'],
+                response['month'],
+                calendar['week_starting_day'],
+                calendar['hide_past_tasks']
+            )
+        months.append((response['year'], response['month'], tasks))
+
+    etag = page_etag(current_app, sum(
+        len(day_tasks) for _, _, tasks in months
+        for days in tasks.values() for day_tasks in days.values()))
+    if client_has_page(etag):
+        return not_modified(etag)
+    details_markup = tasks_details_for_markup(
+        _placed_tasks(*(tasks for _, _, tasks in months)))
+    return with_etag(current_app.response_class(
+        occurrences.dumps(
+            occurrences.document(calendar, months, details_markup)),
+        mimetype='application/json'), etag)
+
+
 @mod_calendar.route('/create', methods=['GET'])
 # @auth.requires_auth('post:calendars')
 def new_calendar():  # jwt):
@@ -253,6 +647,7 @@ def save_calendar():  # jwt):
             ret, response = api_request(
                 'POST', '/calendars/', json.dumps(calendar))
             if ret is True:
+                invalidate_calendar_cache()
                 flash('Calendar ' + form.name.data +
                       ' was successfully created!')
                 return redirect(
@@ -280,15 +675,33 @@ def delete_calendar(calendar_id):
     if ret is False:
         flash('Calendar %s not found' % calendar_id)
         return response
+    invalidate_calendar_cache(calendar_id)
     name = response['name']
     flash('Calendar ' + name + ' was successfully deleted!')
     return redirect("/calendar/", code=302)
 
 
+'''
+Pages modify tasks and calendars calling the backend API directly, they
+notify the frontend afterwards so its cached responses are dropped.
+'''
+
+
+@mod_calendar.route('/<int:calendar_id>/invalidate', methods=['POST'])
+def invalidate_calendar(calendar_id):
+    invalidate_calendar_cache(calendar_id)
+    return jsonify({
+        'success': True,
+        'calendar_id': calendar_id
+    })
+
+
 @mod_calendar.route('/<int:calendar_id>/edit', methods=['GET'])
 # @auth.requires_auth('patch:calendars')
 def edit_calendar_form(calendar_id):
-    ret, response = api_request('GET', '/calendars/%d/' % calendar_id)
+    ret, response = api_request(
+        'GET', '/calendars/%d/' % calendar_id,
+        cache_key=calendar_cache_key(calendar_id))
     if ret is False:
         flash('Calendar %s not found' % calendar_id)
         return response
@@ -343,6 +756,7 @@ def save_calendar_form(calendar_id):
     if ret is False:
         flash('Calendar %s not updated' % calendar_id)
         return response
+    invalidate_calendar_cache(calendar_id)
 
     flash('Calendar ' + form.name.data + ' was successfully saved!')
     return redirect("/calendar/%d" % (calendar_id), code=302)
@@ -351,12 +765,16 @@ def save_calendar_form(calendar_id):
 @mod_calendar.route('/<int:calendar_id>/tasks', methods=['GET'])
 # @auth.requires_auth('post:tasks')
 def new_task_form(calendar_id):
-    ret, calendar_query = api_request('GET', '/calendars/%d/' % calendar_id)
+    ret, calendar_query = api_request(
+        'GET', '/calendars/%d/' % calendar_id,
+        cache_key=calendar_cache_key(calendar_id))
     if ret is False:
         flash('Calendar %s not found' % calendar_id)
-        return response
+        return calendar_query
 
-    Calendar.set_first_weekday(calendar_query['calendar']['week_starting_day'])
+    etag = page_etag(current_app)
+    if client_has_page(etag):
+        return not_modified(etag)
 
     min_year = calendar_query['calendar']['min_year']
     max_year = calendar_query['calendar']['max_year']
@@ -411,7 +829,7 @@ def new_task_form(calendar_id):
     else:
         emojis_list = tuple()
 
-    return render_template(
+    return with_etag(render_template(
         "calendar/task.html",
         form=taskForm,
         calendar_id=calendar_id,
@@ -426,9 +844,8 @@ def new_task_form(calendar_id):
             "BUTTON_CUSTOM_COLOR_VALUE"
         ],
         buttons_colors=current_app.config["BUTTONS_COLORS_LIST"],
-        buttons_emojis=emojis_list,
-        api_url=current_app.config["API_URL"] + 'api'
-    )
+        buttons_emojis=emojis_list
+    ), etag)
 
 
 @mod_calendar.route('/<int:calendar_id>/tasks', methods=['POST'])
@@ -473,6 +890,7 @@ def create_task(calendar_id):
         if ret is False:
             flash('Task in calendar %s not created' % calendar_id)
             return response
+        invalidate_calendar_cache(calendar_id, calendars=False)
 
         return redirect(
             "/calendar/%s/?y=%d&m=%d" % (calendar_id, year, month),
@@ -490,14 +908,18 @@ def edit_task(calendar_id, task_id):
         flash('Task %s not found' % task_id)
         return response
 
+    etag = page_etag(current_app)
+    if client_has_page(etag):
+        return not_modified(etag)
+
     task = response['task']
     calendar = response['calendar']
 
     if task['details'] == "&nbsp;":
         task['details'] = ""
 
-    start_time = datetime.strptime(task['start_time'], '%Y-%m-%d, %H:%M:%S')
-    end_time = datetime.strptime(task['end_time'], '%Y-%m-%d, %H:%M:%S')
+    start_time = parse_backend_time(task['start_time'])
+    end_time = parse_backend_time(task['end_time'])
     task['start_time'] = start_time
     task['end_time'] = end_time
 
@@ -518,12 +940,12 @@ def edit_task(calendar_id, task_id):
     taskForm.repetition_subtype.default = task['repetition_subtype']
     taskForm.process()
 
-    if calendar_query['calendar']['emojis_enabled']:
+    if calendar['emojis_enabled']:
         emojis_list = current_app.config["BUTTONS_EMOJIS_LIST"]
     else:
         emojis_list = tuple()
 
-    return render_template(
+    return with_etag(render_template(
         "calendar/task.html",
         form=taskForm,
         calendar_id=calendar_id,
@@ -538,10 +960,8 @@ def edit_task(calendar_id, task_id):
             "BUTTON_CUSTOM_COLOR_VALUE"
         ],
         buttons_colors=current_app.config["BUTTONS_COLORS_LIST"],
-        buttons_emojis=emojis_list,
-        api_url=current_app.config["API_URL"] + 'api',
-        jwt=get_jwt_token()
-    )
+        buttons_emojis=emojis_list
+    ), etag)
 
 
 @mod_calendar.route('/<int:calendar_id>/tasks/<int:task_id>', methods=['POST'])
@@ -560,35 +980,32 @@ def update_task(calendar_id, task_id):
     repetition_type = request.form.get("repetition_type", "")
     repetition_subtype = request.form.get("repetition_subtype", "")
 
-    try:
-        task = Task.getTask(task_id)
-        if task is None:
-            return not_found_error('Task %s not found' % task_id)
-
-        task.calendar_id = calendar_id
-        task.title = title
-        task.color = color
-        task.details = details
-        task.start_time = datetime.strptime(
-            '%s %s' % (start_date, start_time), '%Y-%m-%d %H:%M')
-        task.end_time = datetime.strptime(
-            '%s %s' % (end_date, end_time), '%Y-%m-%d %H:%M')
-        task.is_all_day = is_all_day
-        task.is_recurrent = is_recurrent
-        task.repetition_value = repetition_value
-        task.repetition_type = repetition_type
-        task.repetition_subtype = repetition_subtype
-
-        task.update()
-    except Exception:
-        print("Unexpected error:", sys.exc_info()[0])
-        return unprocessable_entity_error('Task %s not saved' % task_id)
+    updatedTask = {
+        'calendar_id': calendar_id,
+        'title': title,
+        'color': color,
+        'details': details,
+        'start_time': start_date + ', ' + start_time,
+        'end_time': end_date + ', ' + end_time,
+        'is_all_day': is_all_day,
+        'is_recurrent': is_recurrent,
+        'repetition_value': repetition_value,
+        'repetition_type': repetition_type,
+        'repetition_subtype': repetition_subtype
+    }
+    ret, response = api_request(
+        'PATCH', '/calendars/tasks/%d/' % task_id, json.dumps(updatedTask))
+    if ret is False:
+        flash('Task %s not saved' % task_id)
+        return response
+    invalidate_calendar_cache(calendar_id, calendars=False)
 
+    date_fragments = start_date.split('-')
     return redirect(
         "/calendar/%d?y=%d&m=%d" % (
             calendar_id,
-            task.start_time.year,
-            task.start_time.month
+            int(date_fragments[0]),
+            int(date_fragments[1])
         ),
         code=302
     )
@@ -600,19 +1017,18 @@ def update_task(calendar_id, task_id):
 )
 # @auth.requires_auth('patch:tasks')
 def update_task_day(calendar_id, task_id):
-    body = request.get_json()
-    newDay = int(body.get('newDay'))
+    body = request.get_json(silent=True) or {}
     try:
-        task = Task.getTask(task_id)
-        if task is None:
-            return not_found_error('Task %s not found' % task_id)
-        if newDay:
-            task.start_time = task.start_time.replace(day=newDay)
-            task.end_time = task.end_time.replace(day=newDay)
-            task.update()
-    except Exception:
-        print("Unexpected error:", sys.exc_info()[0])
+        newDay = int(body.get('newDay'))
+    except (TypeError, ValueError):
         return unprocessable_entity_error('Task %s not saved' % task_id)
+    if newDay:
+        ret, response = api_request(
+            'PATCH', '/calendars/tasks/%d/' % task_id,
+            json.dumps({'newDay': newDay}))
+        if ret is False:
+            return response
+        invalidate_calendar_cache(calendar_id, calendars=False)
 
     return jsonify({
         'success': True,
@@ -620,20 +1036,111 @@ def update_task_day(calendar_id, task_id):
     })
 
 
+# Fields of a task the items of a batch can change, newDay moving the task
+# to another day of its month
+BATCH_TASK_FIELDS = (
+    'newDay',
+    'title',
+    'color',
+    'details',
+    'start_time',
+    'end_time',
+    'is_all_day',
+    'is_recurrent',
+    'repetition_value',
+    'repetition_type',
+    'repetition_subtype',
+)
+
+
+# The items of a batch body, None when it is malformed
+def _batch_items(body, max_items):
+    if not isinstance(body, dict) or not isinstance(body.get('tasks'), list):
+        return None
+    items = body['tasks']
+    if not items or len(items) > max_items:
+        return None
+    for item in items:
+        if not isinstance(item, dict) or type(item.get('id')) is not int:
+            return None
+    return items
+
+
+def _batch_result(task_id, ret, response):
+    if ret is False:
+        # An error page and its status code
+        return {'id': task_id, 'success': False, 'error': response[1]}
+    if response.get('success', True) is False:
+        return {'id': task_id, 'success': False,
+                'error': response.get('error', 500)}
+    return {'id': task_id, 'success': True}
+
+
+'''
+update_tasks(calendar_id)
+    moves or edits many tasks in one request (multi-select drag-and-drop):
+    {"tasks": [{"id": task id, "newDay": day, <BATCH_TASK_FIELDS>...}]}.
+    The tasks are read first: only those of the calendar are changed, the
+    others fail with a 404, as only the cached months of the calendar are
+    evicted. The backend calls of each step are sent concurrently, as the
+    calls of a page are (API_FANOUT_WORKERS threads over the pooled
+    connections), and the months are evicted once for the whole batch.
+    Answers the result of every item, in the order of the items; success
+    is only true when all of them were saved.
+'''
+
+
+@mod_calendar.route('/<int:calendar_id>/tasks/batch', methods=['POST'])
+# @auth.requires_auth('patch:tasks')
+def update_tasks(calendar_id):
+    items = _batch_items(
+        request.get_json(silent=True),
+        current_app.config.get('API_BATCH_MAX_ITEMS', 100))
+    if items is None:
+        return unprocessable_entity_error('Tasks not saved')
+
+    results = [None] * len(items)
+    checks = api_requests([
+        backend_call('GET', '/calendars/tasks/%d/' % item['id'])
+        for item in items
+    ])
+    positions = []
+    calls = []
+    for position, (item, (ret, response)) in enumerate(zip(items, checks)):
+        result = _batch_result(item['id'], ret, response)
+        if result['success'] and \
+                response['task']['calendar_id'] != calendar_id:
+            result = {'id': item['id'], 'success': False, 'error': 404}
+        if not result['success']:
+            results[position] = result
+            continue
+        changes = dict((name, item[name]) for name in BATCH_TASK_FIELDS
+                       if name in item)
+        positions.append(position)
+        calls.append(backend_call(
+            'PATCH', '/calendars/tasks/%d/' % item['id'],
+            json.dumps(changes)))
+    for position, (ret, response) in zip(positions, api_requests(calls)):
+        results[position] = _batch_result(items[position]['id'], ret, response)
+    if any(result['success'] for result in results):
+        invalidate_calendar_cache(calendar_id, calendars=False)
+
+    return jsonify({
+        'success': all(result['success'] for result in results),
+        'results': results
+    })
+
+
 @mod_calendar.route(
     '/<int:calendar_id>/tasks/<int:task_id>',
     methods=['DELETE']
 )
 # @auth.requires_auth('delete:tasks')
 def delete_task(calendar_id, task_id):
-    try:
-        task = Task.getTask(task_id)
-        if task is None:
-            return not_found_error('Task %s not found' % task_id)
-        task.delete()
-    except Exception:
-        print("Unexpected error:", sys.exc_info()[0])
-        return unprocessable_entity_error('Task %s not saved' % task_id)
+    ret, response = api_request('DELETE', '/calendars/tasks/%d/' % task_id)
+    if ret is False:
+        return response
+    invalidate_calendar_cache(calendar_id, calendars=False)
 
     return jsonify({
         'success': True,
@@ -0,0 +1,194 @@
+""" Decoding of the backend responses
+
+loads() decodes a whole body, with orjson when it is installed.
+
+For the months with many tasks, iter_members() decodes a JSON object
+incrementally from the chunks of a streamed body: the members are decoded
+one at a time, and the elements of one array member (the tasks) are
+yielded one by one, so neither the body nor the whole list of tasks is
+ever held in memory. The elements are decoded with the C scanner of the
+json module (raw_decode), one per call.
+"""
+import codecs
+import hashlib
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Characters kept in the buffer before the consumed ones are dropped
+BUFFER_TRIM_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+# Characters that can follow a complete value
+VALUE_END = ',:]}' + WHITESPACE
+
+_decoder = json.JSONDecoder()
+
+
+def loads(content):
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class _Reader():
+    """A text buffer over an iterator of byte chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def fill(self):
+        """Reads one more chunk, False at the end of the body."""
+        if self.eof:
+            return False
+        if self.position > BUFFER_TRIM_SIZE:
+            self.buffer = self.buffer[self.position:]
+            self.position = 0
+        for chunk in self.chunks:
+            text = self.decoder.decode(chunk)
+            if text:
+                self.buffer += text
+                return True
+        self.buffer += self.decoder.decode(b'', final=True)
+        self.eof = True
+        return False
+
+    def peek(self):
+        """The next character that is not whitespace, '' at the end."""
+        while True:
+            while self.position < len(self.buffer) and \
+                    self.buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                return ''
+
+    def expect(self, characters):
+        character = self.peek()
+        if character == '' or character not in characters:
+            raise ValueError('Expected %r at %d, got %r' % (
+                characters, self.position, character))
+        self.position += 1
+        return character
+
+    def value(self):
+        """Decodes the next value. A value is only complete when a delimiter
+        follows it: a number cut by the end of a chunk ("1." or "2e") would
+        decode too, as its shorter integer."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.position)
+                if self.eof or (end < len(self.buffer) and
+                                self.buffer[end] in VALUE_END):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+
+def iter_members(chunks, streamed_key):
+    """Yields (key, value, is_element) for the members of the JSON object
+    of chunks; the array of streamed_key is yielded element by element,
+    with is_element True."""
+    reader = _Reader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise ValueError('Expected a member name, got %r' % (key,))
+        reader.expect(':')
+        if key == streamed_key and reader.peek() == '[':
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.expect(']')
+            else:
+                # One string per member name for all the elements, as
+                # json.loads shares them within a document
+                names = {}
+                while True:
+                    element = reader.value()
+                    if isinstance(element, dict):
+                        element = {names.setdefault(name, name): value
+                                   for name, value in element.items()}
+                    yield key, element, True
+                    if reader.expect(',]') == ']':
+                        break
+        else:
+            yield key, reader.value(), False
+        if reader.expect(',}') == '}':
+            return
+
+
+'''
+split_members(members, required)
+    (fields, elements) of an iter_members iterator: fields holds the
+    members decoded so far and is completed as elements is consumed.
+    When a required member comes after the streamed array, the array is
+    read into a list first, so the fields are known before the elements.
+'''
+
+
+def split_members(members, required=()):
+    fields = {}
+    first = []
+    for key, value, is_element in members:
+        if is_element:
+            first.append(value)
+            break
+        fields[key] = value
+
+    def elements():
+        for element in first:
+            yield element
+        for key, value, is_element in members:
+            if is_element:
+                yield value
+            else:
+                fields[key] = value
+
+    if first and any(key not in fields for key in required):
+        return fields, iter(list(elements()))
+    return fields, elements()
+
+
+'''
+StreamedResponse
+    a backend response decoded while it is received: fields are its
+    members, completed as elements (the array of streamed_key) is
+    consumed. digest, the same as payload_digest of the whole body, is
+    only known once elements is exhausted. close is called at the end of
+    the body, or when elements is dropped before it.
+'''
+
+
+class StreamedResponse():
+    def __init__(self, chunks, streamed_key, required=(), close=None):
+        self._hasher = hashlib.sha1()
+        self._close = close
+        self.fields, self.elements = split_members(
+            iter_members(self._hashed(chunks), streamed_key), required)
+
+    def _hashed(self, chunks):
+        try:
+            for chunk in chunks:
+                self._hasher.update(chunk)
+                yield chunk
+        finally:
+            if self._close is not None:
+                self._close()
+
+    @property
+    def digest(self):
+        return self._hasher.hexdigest()
@@ -0,0 +1,59 @@
+""" Delta sync of the cached month responses
+
+The backend sends the version of the data of a month response in its
+X-Sync-Version header. Once a cached month has expired, it is requested
+again with ?since=<version>: the backend only answers with the tasks of
+the month changed since that version (changed) and the ids of the tasks
+deleted or moved to another month (deleted), which are merged into the
+cached response instead of fetching the whole month again. Most syncs of
+a busy calendar carry zero or one task.
+"""
+import hashlib
+
+from app.mod_calendar.response_cache import CachedResponse
+
+VERSION_HEADER = 'X-Sync-Version'
+# Members of a delta response that are not members of the month response
+DELTA_MEMBERS = ('since', 'changed', 'deleted')
+
+
+def sync_url(url, version):
+    return '%s%ssince=%s' % (url, '&' if '?' in url else '?', version)
+
+
+def is_delta(response):
+    return 'changed' in response
+
+
+'''
+merge_delta(stale, delta)
+    CachedResponse of the month of stale with the changes of delta. The
+    changed tasks keep their place, the new ones are appended, as the
+    backend lists them by creation. The digest of the merged response
+    only changes with the data: the page ETags of a month without
+    changes stay valid.
+'''
+
+
+def merge_delta(stale, delta):
+    changes = delta.response
+    changed = dict((task['id'], task) for task in changes['changed'])
+    deleted = set(changes['deleted'])
+    tasks = []
+    for task in stale.response['tasks']:
+        if task['id'] in changed:
+            tasks.append(changed.pop(task['id']))
+        elif task['id'] not in deleted:
+            tasks.append(task)
+    tasks.extend(changed.values())
+
+    response = dict(stale.response, tasks=tasks)
+    response.update((name, value) for name, value in changes.items()
+                    if name not in DELTA_MEMBERS)
+
+    digest = stale.digest
+    if changes['changed'] or changes['deleted'] or \
+            response.get('calendar') != stale.response.get('calendar'):
+        digest = hashlib.sha1(
+            (stale.digest + delta.digest).encode()).hexdigest()
+    return CachedResponse(response, digest, None, None, delta.version)
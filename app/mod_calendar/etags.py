@@ -0,0 +1,94 @@
+import hashlib
+import os
+import time
+from datetime import date
+
+from flask import g, make_response, request, session
+
+
+def payload_digest(content):
+    """Digest of the raw body of a backend response."""
+    return hashlib.sha1(content).hexdigest()
+
+
+def record_payload(digest):
+    """Remembers a backend payload the current page is rendered from."""
+    g.setdefault('backend_digests', []).append(digest)
+
+
+'''
+templates_version(app)
+    digest of the templates of the application and of the fingerprinted
+    assets they link, computed once per process, so deploying new
+    templates or assets changes every ETag
+'''
+
+
+def templates_version(app):
+    version = app.extensions.get('templates_version')
+    if version is None:
+        hasher = hashlib.sha1()
+        assets = app.extensions.get('assets')
+        if assets is not None:
+            hasher.update(assets.version.encode())
+        for root, dirs, files in os.walk(app.template_folder):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                hasher.update(path.encode())
+                with open(path, 'rb') as template:
+                    hasher.update(template.read())
+        version = app.extensions['templates_version'] = hasher.hexdigest()
+    return version
+
+
+'''
+page_etag(app, *parts)
+    strong ETag of a page rendered from the backend payloads recorded
+    during the request. Besides the payloads, the page depends on the
+    templates, the URL, the user session (JWT and CSRF token embedded in
+    it), the current date and whatever the view passes as parts. The
+    CSRF tokens expire, so the ETag also changes every half of their
+    lifetime.
+    Returns None when the page must not be revalidated: no payload, or
+    flashed messages waiting to be shown.
+'''
+
+
+def page_etag(app, *parts):
+    digests = g.get('backend_digests')
+    if not app.config.get('PAGE_ETAGS', True) or not digests or \
+            '_flashes' in session:
+        return None
+    time_limit = app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    token_period = int(time.time() // (time_limit / 2)) if time_limit else 0
+    hasher = hashlib.sha1()
+    for part in (templates_version(app), request.full_path,
+                 session.get('profile'), session.get('jwt_token'),
+                 session.get('csrf_token'), token_period,
+                 date.today()) + tuple(digests) + parts:
+        hasher.update(repr(part).encode())
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+
+def client_has_page(etag):
+    # Weak comparison: compressed pages carry the ETag as a weak one
+    return etag is not None and request.if_none_match.contains_weak(etag)
+
+
+def not_modified(etag):
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def with_etag(page, etag):
+    if etag is None:
+        return page
+    response = make_response(page)
+    response.set_etag(etag)
+    # Pages are per user: browsers keep them and revalidate every time
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
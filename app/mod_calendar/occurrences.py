@@ -0,0 +1,96 @@
+""" Compact JSON of the task occurrences of a range of months
+
+The month view data, placed as for calendar.html, for pages rendering the
+months on the client:
+
+    {
+        "c": {"i": id, "n": name, "w": week_starting_day,
+              "h": hide_past_tasks},
+        "t": {"<task id>": {"i": id, "t": title, "c": color, "d": details,
+                            "s": start_time, "e": end_time,
+                            "a": is_all_day, "r": is_recurrent}},
+        "m": [{"y": year, "m": month,
+               "o": {"<month>": {"<day>": [task ids]}}}]
+    }
+
+The details are sent as the month page shows them, with their links
+decorated (tasks_details_for_markup). Every task is only sent once,
+however many times it occurs; the task ids of a day are sorted by start
+time like on the month page. The occurrences of a month also cover the
+days of the adjacent months its grid shows.
+Booleans are sent as 0 or 1. Encoded with orjson when it is installed.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Field of a task -> its name in the document
+TASK_FIELDS = (
+    ('id', 'i'),
+    ('title', 't'),
+    ('color', 'c'),
+    ('details', 'd'),
+    ('start_time', 's'),
+    ('end_time', 'e'),
+    ('is_all_day', 'a'),
+    ('is_recurrent', 'r'),
+)
+BOOLEAN_FIELDS = ('is_all_day', 'is_recurrent')
+
+
+def compact_task(task, details_markup=None):
+    compact = {
+        short: int(task[name]) if name in BOOLEAN_FIELDS else task[name]
+        for name, short in TASK_FIELDS
+    }
+    if details_markup is not None:
+        compact['d'] = details_markup.get(task['details'], task['details'])
+    return compact
+
+
+def compact_occurrences(tasks, table, details_markup=None):
+    """{month: {day: [tasks]}} as place_tasks returns it, with the task ids
+    only; the tasks themselves are added to table."""
+    occurrences = {}
+    for month, days in tasks.items():
+        month_days = occurrences[str(month)] = {}
+        for day, day_tasks in days.items():
+            for task in day_tasks:
+                if task['id'] not in table:
+                    table[task['id']] = compact_task(task, details_markup)
+            month_days[str(day)] = [
+                task['id'] for task in
+                sorted(day_tasks, key=lambda task: task['start_time'])]
+    return occurrences
+
+
+def document(calendar, months, details_markup=None):
+    """The JSON document of a calendar, months being (year, month, tasks)
+    tuples with the tasks placed by place_tasks, and details_markup the
+    decorated details of the tasks (details -> markup)."""
+    table = {}
+    months = [{
+        'y': year,
+        'm': month,
+        'o': compact_occurrences(tasks, table, details_markup)
+    } for year, month, tasks in months]
+    return {
+        'c': {
+            'i': calendar['id'],
+            'n': calendar['name'],
+            'w': calendar['week_starting_day'],
+            'h': int(calendar['hide_past_tasks'])
+        },
+        't': {str(task_id): task for task_id, task in table.items()},
+        'm': months
+    }
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(
+        data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
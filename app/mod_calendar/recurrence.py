@@ -0,0 +1,272 @@
+""" Placement of the tasks of a month in the calendar grid
+
+The month grid is indexed once per (year, month, first_weekday): the days
+of every column of the grid and the cell of every day. Recurrent tasks are
+then placed with direct lookups instead of walking the whole grid once per
+task. Large task sets go through a NumPy vectorized path when NumPy is
+installed.
+
+The placement keeps the historical rules of the month view:
+    - weekly ('w'): every day of the grid column repetition_value
+    - monthly by week day ('m', 'w'): first day of the column
+      repetition_value
+    - monthly by day ('m', 'm'): the day repetition_value
+    - non-recurrent tasks: the day and month of their start_time
+Column numbers are relative to the first week day of the calendar.
+"""
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+from heapq import merge
+
+from app.mod_calendar.calendar import Calendar
+from app.mod_calendar.timestamps import parse_backend_time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Number of recurrent tasks from which the NumPy path is used
+VECTORIZE_MIN_TASKS = 2000
+
+'''
+MonthIndex
+    weekday_days: tuple with the days of each of the 7 grid columns
+    day_cells: dict day -> (week row, column)
+    weeks: the month grid, as Calendar.month_days_with_weekday returns it
+'''
+MonthIndex = namedtuple('MonthIndex', ['weekday_days', 'day_cells', 'weeks'])
+
+
+@lru_cache(maxsize=256)
+def month_index(year, month, first_weekday):
+    weeks = Calendar.month_days_with_weekday(year, month, first_weekday)
+    columns = [[] for _ in range(7)]
+    day_cells = {}
+    for row, week in enumerate(weeks):
+        for column, day in enumerate(week):
+            if day == 0:
+                continue
+            columns[column].append(day)
+            day_cells[day] = (row, column)
+    return MonthIndex(
+        weekday_days=tuple(tuple(days) for days in columns),
+        day_cells=day_cells,
+        weeks=weeks
+    )
+
+
+def recurrence_days(task, index):
+    """Days of the month in which a recurrent task happens."""
+    value = task['repetition_value']
+    if task['repetition_type'] == 'w':
+        return _column_days(index, value)
+    elif task['repetition_type'] == 'm':
+        if task['repetition_subtype'] == 'w':
+            return _column_days(index, value)[:1]
+        elif task['repetition_subtype'] == 'm':
+            return (int(value),) if value in index.day_cells else ()
+    return ()
+
+
+def _column_days(index, value):
+    for column, days in enumerate(index.weekday_days):
+        if value == column:
+            return days
+    return ()
+
+
+'''
+PastFilter
+    tells whether the occurrence of a task in a day of the month has
+    already finished. As the month view always did, the occurrence ends in
+    the current year at the end_time hour of the task.
+'''
+
+
+class PastFilter():
+    def __init__(self, month, now=None):
+        self.month = month
+        self.now = now or datetime.now()
+
+    def end_time(self, task):
+        return parse_backend_time(task['end_time'])
+
+    def is_past(self, task, day):
+        end_time = self.end_time(task)
+        try:
+            task_end_time = datetime(
+                self.now.year,
+                self.month, day,
+                end_time.hour,
+                end_time.minute,
+                end_time.second
+            )
+        except ValueError:
+            # February 29th out of a leap year
+            return False
+        return task_end_time < self.now
+
+    def day_limits(self, days):
+        """Per day, the number of seconds since midnight before which an
+        occurrence is past: -1 never, 86400 always."""
+        limits = numpy.full(32, -1.0)
+        for day in days:
+            try:
+                day_start = datetime(self.now.year, self.month, day)
+            except ValueError:
+                continue
+            if day_start.date() < self.now.date():
+                limits[day] = 86400.0
+            elif day_start.date() == self.now.date():
+                limits[day] = (self.now - day_start).total_seconds()
+        return limits
+
+
+def _single_occurrences(tasks):
+    for position, task in enumerate(tasks):
+        if not task['is_recurrent']:
+            start_time = parse_backend_time(task['start_time'])
+            yield position, start_time.month, start_time.day, task
+
+
+def _recurrent_occurrences(tasks, index, month, past_filter):
+    for position, task in enumerate(tasks):
+        if task['is_recurrent']:
+            for day in recurrence_days(task, index):
+                if past_filter is not None and \
+                        past_filter.is_past(task, day):
+                    continue
+                yield position, month, day, task
+
+
+def _vectorized_occurrences(tasks, index, month, past_filter):
+    positions = []
+    codes = []
+    values = []
+    for position, task in enumerate(tasks):
+        if not task['is_recurrent']:
+            continue
+        value = task['repetition_value']
+        if task['repetition_type'] == 'w':
+            code = 0
+        elif task['repetition_type'] == 'm' and \
+                task['repetition_subtype'] == 'w':
+            code = 1
+        elif task['repetition_type'] == 'm' and \
+                task['repetition_subtype'] == 'm':
+            code = 2
+        else:
+            continue
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            continue
+        if number != value or not 0 <= number <= 31:
+            # Out of the lookup table: never matches a column or a day
+            continue
+        positions.append(position)
+        codes.append(code)
+        values.append(number)
+    if not positions:
+        return
+
+    # rules[code, value] is the mask of the days (1..31) of the occurrences
+    rules = numpy.zeros((3, 32, 32), dtype=bool)
+    for column, days in enumerate(index.weekday_days):
+        rules[0, column, list(days)] = True
+        rules[1, column, days[0]] = True
+    for day in index.day_cells:
+        rules[2, day, day] = True
+
+    positions = numpy.array(positions)
+    occurrences = rules[numpy.array(codes), numpy.array(values)]
+    if past_filter is not None:
+        limits = past_filter.day_limits(index.day_cells)
+        end_seconds = numpy.array([
+            end_time.hour * 3600 + end_time.minute * 60 + end_time.second
+            for end_time in (
+                past_filter.end_time(tasks[position])
+                for position in positions
+            )
+        ], dtype=float)
+        occurrences &= ~(end_seconds[:, None] < limits[None, :])
+    # Row major order: by task position, then by day
+    rows, days = numpy.nonzero(occurrences)
+    for position, day in zip(positions[rows].tolist(), days.tolist()):
+        yield position, month, day, tasks[position]
+
+
+'''
+place_tasks(tasks, year, month, first_weekday, view_past_tasks)
+    returns the tasks of a month as {month: {day: [tasks]}}. Tasks keep
+    the order of the backend response inside every day.
+'''
+
+
+def place_tasks(
+    tasks,
+    year,
+    month,
+    first_weekday,
+    view_past_tasks=True,
+    now=None,
+    vectorize_min_tasks=VECTORIZE_MIN_TASKS
+):
+    index = month_index(year, month, first_weekday)
+    past_filter = None if view_past_tasks else PastFilter(month, now)
+
+    recurrent_count = sum(1 for task in tasks if task['is_recurrent'])
+    if numpy is not None and recurrent_count >= vectorize_min_tasks:
+        recurrent = _vectorized_occurrences(tasks, index, month, past_filter)
+    else:
+        recurrent = _recurrent_occurrences(tasks, index, month, past_filter)
+
+    return _tasks_list(merge(
+        _single_occurrences(tasks),
+        recurrent,
+        key=lambda occurrence: occurrence[0]
+    ))
+
+
+def _tasks_list(occurrences):
+    tasks_list = {}
+    for _, task_month, day, task in occurrences:
+        tasks_list.setdefault(task_month, {}).setdefault(day, []).append(
+            task)
+    return tasks_list
+
+
+def _streamed_occurrences(tasks, index, month, past_filter):
+    for position, task in enumerate(tasks):
+        if task['is_recurrent']:
+            for day in recurrence_days(task, index):
+                if past_filter is not None and \
+                        past_filter.is_past(task, day):
+                    continue
+                yield position, month, day, task
+        else:
+            start_time = parse_backend_time(task['start_time'])
+            yield position, start_time.month, start_time.day, task
+
+
+'''
+place_task_stream(tasks, year, month, first_weekday, view_past_tasks)
+    place_tasks for an iterator of tasks, placed in a single pass as they
+    are decoded: only the tasks that occur in the month are kept.
+'''
+
+
+def place_task_stream(
+    tasks,
+    year,
+    month,
+    first_weekday,
+    view_past_tasks=True,
+    now=None
+):
+    index = month_index(year, month, first_weekday)
+    past_filter = None if view_past_tasks else PastFilter(month, now)
+    return _tasks_list(
+        _streamed_occurrences(tasks, index, month, past_filter))
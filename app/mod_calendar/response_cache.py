@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+
+'''
+CachedResponse
+    a decoded backend response with the digest of its body, the
+    validators (ETag, Last-Modified) the backend sent with it, and the
+    sync version of month responses (delta.py)
+'''
+CachedResponse = namedtuple(
+    'CachedResponse',
+    ['response', 'digest', 'etag', 'last_modified', 'version'],
+    defaults=(None,))
+
+
+'''
+ResponseCache
+    size-bounded LRU cache of backend GET responses with a per-entry TTL.
+    Entries are indexed by (user, key), where key starts with the calendar
+    id the response belongs to, e.g. (calendar_id, year, month), so all
+    the cached months of a calendar can be evicted at once after a write.
+    Expired entries are kept (until evicted) so they can be revalidated
+    with the backend and refreshed instead of refetched.
+    Cached responses are shared, callers must not modify them.
+'''
+
+
+class ResponseCache():
+    def __init__(self, maxsize=512, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_calendar = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = 0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            maxsize=config.get('API_CACHE_SIZE', 512),
+            ttl=config.get('API_CACHE_TTL', 30)
+        )
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, user, key):
+        entry_key = (user, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None:
+                expires_at, response = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(entry_key)
+                    self.hits += 1
+                    return response
+            self.misses += 1
+        return None
+
+    def stale(self, user, key):
+        """The cached response, even when it has expired."""
+        with self._lock:
+            entry = self._entries.get((user, key))
+        return entry[1] if entry is not None else None
+
+    def refresh(self, user, key, ttl=None):
+        """Extends an entry the backend confirmed it is still current."""
+        entry_key = (user, key)
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is None:
+                return None
+            self._entries[entry_key] = (expires_at, entry[1])
+            self._entries.move_to_end(entry_key)
+            self.revalidations += 1
+            return entry[1]
+
+    def set(self, user, key, response, ttl=None):
+        if not self.enabled:
+            return
+        entry_key = (user, key)
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[entry_key] = (expires_at, response)
+            self._entries.move_to_end(entry_key)
+            self._by_calendar.setdefault(key[0], set()).add(entry_key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, entry_key):
+        self._entries.pop(entry_key, None)
+        calendar_keys = self._by_calendar.get(entry_key[1][0])
+        if calendar_keys is not None:
+            calendar_keys.discard(entry_key)
+            if not calendar_keys:
+                del self._by_calendar[entry_key[1][0]]
+
+    def invalidate(self, calendar_id):
+        """Evicts every entry of a calendar, for every user."""
+        with self._lock:
+            for entry_key in list(self._by_calendar.get(calendar_id, ())):
+                self._remove(entry_key)
+
+    def expire(self, calendar_id):
+        """Expires every entry of a calendar, for every user, keeping them
+        to be revalidated or synced."""
+        with self._lock:
+            for entry_key in self._by_calendar.get(calendar_id, ()):
+                self._entries[entry_key] = (0, self._entries[entry_key][1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_calendar.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'revalidations': self.revalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+_cache_lock = threading.Lock()
+
+
+def get_response_cache(app):
+    cache = app.extensions.get('api_response_cache')
+    if cache is None:
+        with _cache_lock:
+            cache = app.extensions.get('api_response_cache')
+            if cache is None:
+                cache = ResponseCache.from_config(app.config)
+                app.extensions['api_response_cache'] = cache
+    return cache
@@ -0,0 +1,32 @@
+""" Parsing of the timestamps sent by the backend
+
+The backend always formats task times as 'YYYY-MM-DD, HH:MM:SS'. Those are
+parsed by slicing the fixed positions, which is much cheaper than
+datetime.strptime, and every distinct string is parsed only once. Any
+other layout falls back to strptime, with its errors.
+"""
+from datetime import datetime
+from functools import lru_cache
+
+BACKEND_TIME_FORMAT = '%Y-%m-%d, %H:%M:%S'
+# Distinct timestamps kept already parsed
+TIMESTAMPS_CACHE_SIZE = 8192
+
+
+def _parse_fixed_layout(value):
+    if (
+        len(value) == 20
+        and value[4] == '-' and value[7] == '-' and value[10:12] == ', '
+        and value[14] == ':' and value[17] == ':'
+    ):
+        digits = value[0:4] + value[5:7] + value[8:10] + \
+            value[12:14] + value[15:17] + value[18:20]
+        if digits.isascii() and digits.isdigit():
+            return datetime(
+                int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                int(value[12:14]), int(value[15:17]), int(value[18:20]))
+    return datetime.strptime(value, BACKEND_TIME_FORMAT)
+
+
+parse_backend_time = lru_cache(maxsize=TIMESTAMPS_CACHE_SIZE)(
+    _parse_fixed_layout)
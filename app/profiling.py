@@ -0,0 +1,168 @@
+import cProfile
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+# Header carrying PROFILING_SECRET, and the one choosing the output
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_FORMAT_HEADER = 'HTTP_X_PROFILE_FORMAT'
+UNSAFE_FILENAME_REGEX = re.compile(r'[^\w.-]+')
+
+
+'''
+StackSampler(thread_id, interval)
+    samples the stack of one thread every interval seconds from a
+    background thread. Cheaper than cProfile on deep call trees, and its
+    output is the collapsed stack format read by flamegraph.pl and
+    speedscope: one "outer;...;inner count" line per distinct stack.
+'''
+
+
+class StackSampler():
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def frame_name(frame):
+        code = frame.f_code
+        return '%s (%s:%d)' % (code.co_name,
+                               os.path.basename(code.co_filename),
+                               code.co_firstlineno)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(self.frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return ''.join('%s %d\n' % (stack, count)
+                       for stack, count in sorted(self.stacks.items()))
+
+
+'''
+ProfilingMiddleware
+    profiles the requests carrying the secret X-Profile header, including
+    the rendering of streamed bodies. Other requests only pay for the
+    header lookup.
+        X-Profile-Format: cprofile (default)
+            cProfile stats (pstats, snakeviz) written to the profiles
+            directory, the response is the regular one with an
+            X-Profile-File header
+        X-Profile-Format: collapsed
+            sampled collapsed stacks, also written to the directory, sent
+            back instead of the regular response
+'''
+
+
+class ProfilingMiddleware():
+    def __init__(self, wsgi_app, secret, directory, interval=0.001):
+        self.wsgi_app = wsgi_app
+        self.secret = secret.encode()
+        self.directory = directory
+        self.interval = interval
+
+    def __call__(self, environ, start_response):
+        token = environ.get(PROFILE_HEADER)
+        if token is None or \
+                not hmac.compare_digest(token.encode(), self.secret):
+            return self.wsgi_app(environ, start_response)
+
+        captured = []
+        body = []
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return body.append
+
+        def run():
+            iterable = self.wsgi_app(environ, capture_start_response)
+            try:
+                body.extend(iterable)
+            finally:
+                if hasattr(iterable, 'close'):
+                    iterable.close()
+
+        output = environ.get(PROFILE_FORMAT_HEADER, 'cprofile').lower()
+        name = self.profile_name(environ)
+        if output == 'collapsed':
+            with StackSampler(threading.get_ident(), self.interval) as sampler:
+                run()
+            collapsed = sampler.collapsed().encode()
+            self.write(name + '.collapsed', collapsed)
+            start_response('200 OK', [
+                ('Content-Type', 'text/plain; charset=utf-8'),
+                ('Content-Length', str(len(collapsed))),
+                ('X-Profile-File', name + '.collapsed')
+            ])
+            return [collapsed]
+
+        profiler = cProfile.Profile()
+        profiler.runcall(run)
+        path = self.path(name + '.prof')
+        profiler.dump_stats(path)
+        status, headers, exc_info = captured
+        start_response(
+            status, headers + [('X-Profile-File', name + '.prof')], exc_info)
+        return body
+
+    def profile_name(self, environ):
+        path = environ.get('PATH_INFO', '').strip('/') or 'root'
+        now = time.time()
+        return '%s.%03d-%d-%s-%s' % (
+            time.strftime('%Y%m%d-%H%M%S', time.localtime(now)),
+            int(now * 1000) % 1000, os.getpid(),
+            environ.get('REQUEST_METHOD', 'GET'),
+            UNSAFE_FILENAME_REGEX.sub('_', path))
+
+    def path(self, filename):
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, filename)
+
+    def write(self, filename, data):
+        with open(self.path(filename), 'wb') as profile:
+            profile.write(data)
+
+
+'''
+init_app(app)
+    installs the profiling middleware when PROFILING_ENABLED is set and a
+    PROFILING_SECRET is configured
+'''
+
+
+def init_app(app):
+    if not app.config.get('PROFILING_ENABLED', False):
+        return
+    secret = app.config.get('PROFILING_SECRET')
+    if not secret:
+        print("Profiling disabled: PROFILING_SECRET is not set")
+        return
+    app.wsgi_app = ProfilingMiddleware(
+        app.wsgi_app,
+        secret,
+        app.config.get('PROFILING_DIR', 'profiles'),
+        app.config.get('PROFILING_SAMPLE_INTERVAL', 0.001)
+    )
@@ -0,0 +1,418 @@
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from jose import jwt
+from jose.exceptions import JWTError
+from werkzeug.datastructures import CallbackDict
+
+import app.mod_auth.constants as constants
+
+# Session ids are secrets.token_urlsafe(SESSION_ID_BYTES)
+SESSION_ID_BYTES = 32
+SESSION_ID_REGEX = re.compile(r'^[A-Za-z0-9_-]{43}$')
+# Saves between two removals of the expired sessions of the shared stores
+PRUNE_INTERVAL = 100
+
+
+def new_session_id():
+    return secrets.token_urlsafe(SESSION_ID_BYTES)
+
+
+'''
+MemorySessionStore
+    sessions of this worker process, in a LRU bounded by a number of
+    sessions and by the size of their serialized data. Only fit for a
+    single worker: the other workers do not see its sessions.
+'''
+
+
+class MemorySessionStore():
+    def __init__(self, maxsize=10000, max_memory_size=32 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.max_memory_size = max_memory_size
+        self.memory_size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if time.time() >= expires_at:
+                self._remove(sid)
+                return None
+            self._entries.move_to_end(sid)
+            return data
+
+    def save(self, sid, data, expires_at):
+        with self._lock:
+            self._remove(sid)
+            self._entries[sid] = (expires_at, data)
+            self.memory_size += len(sid) + len(data)
+            while len(self._entries) > self.maxsize or \
+                    self.memory_size > self.max_memory_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, sid):
+        entry = self._entries.pop(sid, None)
+        if entry is not None:
+            self.memory_size -= len(sid) + len(entry[1])
+
+    def delete(self, sid):
+        with self._lock:
+            self._remove(sid)
+
+    def secret_key(self):
+        return os.urandom(32)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'store': 'memory',
+                'sessions': len(self._entries),
+                'maxsize': self.maxsize,
+                'memory_size': self.memory_size,
+                'max_memory_size': self.max_memory_size,
+                'evictions': self.evictions
+            }
+
+
+'''
+FileSessionStore
+    one file per session in a directory, shared by the workers of a host.
+    Every PRUNE_INTERVAL saves, the expired sessions are removed, and the
+    oldest ones beyond maxsize.
+'''
+
+
+class FileSessionStore():
+    SECRET_KEY_FILE = '.secret_key'
+
+    def __init__(self, directory, maxsize=10000):
+        self.directory = directory
+        self.maxsize = maxsize
+        self._saves = 0
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, sid)
+
+    def _write(self, path, data):
+        # Written aside and renamed: other workers may be reading it
+        temporary = '%s.%s.tmp' % (path, new_session_id())
+        descriptor = os.open(
+            temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as session_file:
+            session_file.write(data)
+        return temporary
+
+    def load(self, sid):
+        try:
+            with open(self._path(sid), encoding='utf-8') as session_file:
+                expires_at = float(session_file.readline())
+                data = session_file.read()
+        except (OSError, ValueError):
+            return None
+        if time.time() >= expires_at:
+            self.delete(sid)
+            return None
+        return data
+
+    def save(self, sid, data, expires_at):
+        path = self._path(sid)
+        os.replace(self._write(path, '%r\n%s' % (expires_at, data)), path)
+        self._saves += 1
+        if self._saves % PRUNE_INTERVAL == 0:
+            self.prune()
+
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except OSError:
+            pass
+
+    def _sessions(self):
+        with os.scandir(self.directory) as entries:
+            return [entry for entry in entries
+                    if SESSION_ID_REGEX.match(entry.name)]
+
+    def prune(self):
+        remaining = []
+        for entry in self._sessions():
+            if self.load(entry.name) is not None:
+                remaining.append(entry)
+        if len(remaining) > self.maxsize:
+            remaining.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in remaining[:len(remaining) - self.maxsize]:
+                self.delete(entry.name)
+
+    def secret_key(self):
+        """A key shared by the workers: the first one to start writes it."""
+        path = os.path.join(self.directory, self.SECRET_KEY_FILE)
+        temporary = self._write(path, os.urandom(32).hex())
+        try:
+            # Fails when the key already exists
+            os.link(temporary, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temporary)
+        with open(path, encoding='utf-8') as key_file:
+            return bytes.fromhex(key_file.read())
+
+    def stats(self):
+        return {
+            'store': 'file',
+            'sessions': len(self._sessions()),
+            'maxsize': self.maxsize
+        }
+
+
+'''
+SQLiteSessionStore
+    sessions in a SQLite database, shared by the workers of a host, with a
+    connection per thread. Pruned like FileSessionStore.
+'''
+
+
+class SQLiteSessionStore():
+    def __init__(self, path, maxsize=10000):
+        self.path = path
+        self.maxsize = maxsize
+        self._saves = 0
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Only readable by this user: it holds tokens and the secret key
+        os.close(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600))
+        with self._connection() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS sessions ('
+                'id TEXT PRIMARY KEY, data TEXT NOT NULL, '
+                'expires_at REAL NOT NULL)')
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS sessions_expires_at '
+                'ON sessions (expires_at)')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS settings ('
+                'name TEXT PRIMARY KEY, value TEXT NOT NULL)')
+
+    def _connect(self):
+        # Autocommit: every statement is its own transaction
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    @contextmanager
+    def _connection(self):
+        # Not kept: the app may be created before gunicorn forks
+        connection = self._connect()
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def load(self, sid):
+        row = self.connection.execute(
+            'SELECT data FROM sessions WHERE id = ? AND expires_at > ?',
+            (sid, time.time())).fetchone()
+        return row[0] if row is not None else None
+
+    def save(self, sid, data, expires_at):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO sessions (id, data, expires_at) '
+            'VALUES (?, ?, ?)', (sid, data, expires_at))
+        self._saves += 1
+        if self._saves % PRUNE_INTERVAL == 0:
+            self.prune()
+
+    def delete(self, sid):
+        self.connection.execute('DELETE FROM sessions WHERE id = ?', (sid,))
+
+    def prune(self):
+        connection = self.connection
+        connection.execute(
+            'DELETE FROM sessions WHERE expires_at <= ?', (time.time(),))
+        excess = connection.execute(
+            'SELECT COUNT(*) FROM sessions').fetchone()[0] - self.maxsize
+        if excess > 0:
+            # The sessions closest to their expiry go first
+            connection.execute(
+                'DELETE FROM sessions WHERE id IN (SELECT id FROM sessions '
+                'ORDER BY expires_at LIMIT ?)', (excess,))
+
+    def secret_key(self):
+        """A key shared by the workers: the first one to start writes it."""
+        with self._connection() as connection:
+            connection.execute(
+                'INSERT OR IGNORE INTO settings (name, value) VALUES (?, ?)',
+                ('secret_key', os.urandom(32).hex()))
+            return bytes.fromhex(connection.execute(
+                'SELECT value FROM settings WHERE name = ?',
+                ('secret_key',)).fetchone()[0])
+
+    def stats(self):
+        return {
+            'store': 'sqlite',
+            'sessions': self.connection.execute(
+                'SELECT COUNT(*) FROM sessions').fetchone()[0],
+            'maxsize': self.maxsize
+        }
+
+
+def store_from_config(config):
+    store = config.get('SESSION_STORE')
+    maxsize = config.get('SESSION_STORE_MAX_ENTRIES', 10000)
+    if store == 'memory':
+        return MemorySessionStore(
+            maxsize, config.get('SESSION_STORE_MAX_MEMORY_SIZE',
+                                32 * 1024 * 1024))
+    if store == 'file':
+        return FileSessionStore(config['SESSION_FILE_DIR'], maxsize)
+    if store == 'sqlite':
+        return SQLiteSessionStore(config['SESSION_SQLITE_PATH'], maxsize)
+    raise ValueError('Unknown SESSION_STORE %r' % store)
+
+
+'''
+ServerSideSession
+    the data of a session and its id, None until the session is saved
+'''
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None):
+        def on_update(session):
+            session.modified = True
+
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = sid is None
+        self.modified = False
+        # The access token the session was loaded with
+        self.token = self.get(constants.JWT_TOKEN)
+
+
+'''
+ServerSideSessionInterface
+    Flask session interface keeping the sessions in a store: the cookie
+    only holds an opaque random id. A session holding an access token
+    expires, in the store and in the browser, with the token (its exp
+    claim); the other ones lifetime seconds after they were last saved.
+    The session id changes when the token does, so an id seen before the
+    login is not the one of the logged-in session.
+'''
+
+
+class ServerSideSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, lifetime=24 * 3600):
+        self.store = store
+        self.lifetime = lifetime
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(app.config['SESSION_COOKIE_NAME'])
+        if sid and SESSION_ID_REGEX.match(sid):
+            data = self.store.load(sid)
+            if data is not None:
+                try:
+                    return ServerSideSession(
+                        self.serializer.loads(data), sid=sid)
+                except ValueError:
+                    self.store.delete(sid)
+        return ServerSideSession()
+
+    def token_expiry(self, session):
+        token = session.get(constants.JWT_TOKEN)
+        if not token:
+            return None
+        try:
+            # The token came from Auth0 and never left the server
+            expires_at = jwt.get_unverified_claims(token).get('exp')
+        except JWTError:
+            return None
+        return float(expires_at) if expires_at else None
+
+    def save_session(self, app, session, response):
+        name = app.config['SESSION_COOKIE_NAME']
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        # The pages depend on the session, whichever the store
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.sid is not None and session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not session.modified:
+            return
+
+        if session.sid is None or \
+                session.get(constants.JWT_TOKEN) != session.token:
+            if session.sid is not None:
+                self.store.delete(session.sid)
+            session.sid = new_session_id()
+        token_expiry = self.token_expiry(session)
+        expires_at = token_expiry or time.time() + self.lifetime
+        self.store.save(
+            session.sid, self.serializer.dumps(dict(session)), expires_at)
+
+        if token_expiry is not None:
+            expires = int(token_expiry)
+        else:
+            expires = self.get_expiration_time(app, session)
+        response.set_cookie(
+            name, session.sid, expires=expires,
+            httponly=self.get_cookie_httponly(app), domain=domain,
+            path=path, secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app))
+
+
+'''
+ServerSideSessions
+    installs the server-side sessions of SESSION_STORE on an application.
+    Without a SECRET_KEY (environment or config), the one the CSRF tokens
+    are signed with is shared by the workers through the store, instead
+    of being random per worker.
+'''
+
+
+class ServerSideSessions():
+    def __init__(self, app=None):
+        self.store = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('SESSION_STORE'):
+            if not app.config.get('SECRET_KEY'):
+                app.config['SECRET_KEY'] = os.urandom(32)
+            return
+        self.store = store_from_config(app.config)
+        if not app.config.get('SECRET_KEY'):
+            app.config['SECRET_KEY'] = self.store.secret_key()
+        app.session_interface = ServerSideSessionInterface(
+            self.store, app.config.get('SESSION_STORE_LIFETIME', 24 * 3600))
+        app.extensions['sessions'] = self
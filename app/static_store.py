@@ -0,0 +1,144 @@
+import hashlib
+import mimetypes
+import mmap
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from flask import current_app, request
+
+# Size of the chunks memory-mapped files are sent in
+MMAP_CHUNK_SIZE = 64 * 1024
+
+'''
+StaticFile
+    a static file of the store: data holds its content, or is None for the
+    files larger than the memory limits, read through a memory map
+'''
+StaticFile = namedtuple(
+    'StaticFile', ['path', 'data', 'size', 'mimetype', 'etag',
+                   'last_modified'])
+
+
+'''
+StaticStore
+    serves the static files from memory: small files (favicons, bundles,
+    stylesheets) are loaded once at startup, larger ones are optionally
+    read through memory maps, so requests do no file system calls. Files
+    missing from the store (added after startup) are served by the regular
+    static view.
+'''
+
+
+class StaticStore():
+    def __init__(self, app=None):
+        self.files = {}
+        self.memory_size = 0
+        self.max_file_size = 256 * 1024
+        self.max_memory_size = 16 * 1024 * 1024
+        self.mmap_enabled = False
+        self._maps = {}
+        self._maps_lock = threading.Lock()
+        self._fallback = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('STATIC_STORE_ENABLED', True):
+            return
+        self.max_file_size = app.config.get(
+            'STATIC_STORE_MAX_FILE_SIZE', self.max_file_size)
+        self.max_memory_size = app.config.get(
+            'STATIC_STORE_MAX_MEMORY_SIZE', self.max_memory_size)
+        self.mmap_enabled = app.config.get('STATIC_STORE_MMAP', False)
+        self.load(app.static_folder)
+        app.extensions['static_store'] = self
+        self._fallback = app.view_functions['static']
+        app.view_functions['static'] = self.serve
+
+    def load(self, folder):
+        for root, dirs, names in os.walk(folder):
+            dirs.sort()
+            for name in sorted(names):
+                path = os.path.join(root, name)
+                filename = os.path.relpath(path, folder).replace(os.sep, '/')
+                self.add(filename, path)
+
+    def add(self, filename, path):
+        stat = os.stat(path)
+        in_memory = stat.st_size <= self.max_file_size and \
+            self.memory_size + stat.st_size <= self.max_memory_size
+        if not in_memory and not self.mmap_enabled:
+            return
+        with open(path, 'rb') as static_file:
+            hasher = hashlib.sha1()
+            data = static_file.read() if in_memory else None
+            if data is not None:
+                hasher.update(data)
+            else:
+                for chunk in iter(
+                        lambda: static_file.read(MMAP_CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+        if in_memory:
+            self.memory_size += stat.st_size
+        self.files[filename] = StaticFile(
+            path=path,
+            data=data,
+            size=stat.st_size,
+            mimetype=mimetypes.guess_type(filename)[0] or
+            'application/octet-stream',
+            etag=hasher.hexdigest(),
+            last_modified=datetime.fromtimestamp(
+                int(stat.st_mtime), timezone.utc)
+        )
+
+    def _mapped(self, static_file):
+        mapped = self._maps.get(static_file.path)
+        if mapped is None:
+            with self._maps_lock:
+                mapped = self._maps.get(static_file.path)
+                if mapped is None:
+                    with open(static_file.path, 'rb') as mapped_file:
+                        mapped = mmap.mmap(
+                            mapped_file.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._maps[static_file.path] = mapped
+        return mapped
+
+    def _chunks(self, static_file):
+        mapped = self._mapped(static_file)
+        for offset in range(0, static_file.size, MMAP_CHUNK_SIZE):
+            yield mapped[offset:offset + MMAP_CHUNK_SIZE]
+
+    def serve(self, filename):
+        static_file = self.files.get(filename)
+        if static_file is None:
+            return self._fallback(filename=filename)
+        return self.response(filename)
+
+    def response(self, filename):
+        static_file = self.files[filename]
+        app = current_app._get_current_object()
+        if static_file.data is not None:
+            response = app.response_class(
+                static_file.data, mimetype=static_file.mimetype)
+        else:
+            response = app.response_class(
+                self._chunks(static_file), mimetype=static_file.mimetype)
+            response.headers['Content-Length'] = str(static_file.size)
+        response.set_etag(static_file.etag)
+        response.last_modified = static_file.last_modified
+        response.cache_control.public = True
+        max_age = app.get_send_file_max_age(filename)
+        if max_age is not None:
+            response.cache_control.max_age = max_age
+        return response.make_conditional(request)
+
+    def stats(self):
+        return {
+            'files': len(self.files),
+            'in_memory': sum(1 for static_file in self.files.values()
+                             if static_file.data is not None),
+            'memory_size': self.memory_size,
+            'mapped': len(self._maps)
+        }
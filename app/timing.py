@@ -0,0 +1,210 @@
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from flask import g, has_request_context
+
+# Upper bounds (seconds) of the histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+           2.5, 5.0, 10.0)
+# Phases of a request, as they are named in the Server-Timing header
+PHASES = {
+    'api': 'Backend API',
+    'jwt': 'JWT verification',
+    'placement': 'Task placement',
+    'render': 'Template rendering',
+    'total': 'Total'
+}
+
+# Set by init_app, phases are not measured while it is False
+enabled = False
+
+
+'''
+Histogram
+    thread-safe Prometheus style histogram of durations in seconds
+'''
+
+
+class Histogram():
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        position = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[position] += 1
+            self._sum += seconds
+
+    def snapshot(self):
+        """Cumulative bucket counts (the last one is +Inf) and the sum."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total
+
+
+'''
+PhaseMetrics
+    one histogram per request phase, kept per worker process
+'''
+
+
+class PhaseMetrics():
+    name = 'calendar_request_phase_seconds'
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, phase, seconds):
+        histogram = self._histograms.get(phase)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(
+                    phase, Histogram(self.buckets))
+        histogram.observe(seconds)
+
+    def exposition(self):
+        """Text exposition format read by Prometheus."""
+        lines = [
+            '# HELP %s Time spent in each phase of a request.' % self.name,
+            '# TYPE %s histogram' % self.name
+        ]
+        bounds = ['%g' % bound for bound in self.buckets] + ['+Inf']
+        for phase in sorted(self._histograms):
+            counts, total = self._histograms[phase].snapshot()
+            for bound, count in zip(bounds, counts):
+                lines.append('%s_bucket{phase="%s",le="%s"} %d' % (
+                    self.name, phase, bound, count))
+            lines.append('%s_sum{phase="%s"} %.6f' % (
+                self.name, phase, total))
+            lines.append('%s_count{phase="%s"} %d' % (
+                self.name, phase, counts[-1]))
+        return '\n'.join(lines) + '\n'
+
+
+metrics = PhaseMetrics()
+
+
+def record(phase, seconds):
+    metrics.observe(phase, seconds)
+    if has_request_context():
+        timings = g.get('phase_timings')
+        if timings is not None:
+            timings[phase] = timings.get(phase, 0.0) + seconds
+
+
+'''
+phase(name)
+    context manager measuring a phase of the current request:
+
+        with phase('placement'):
+            ...
+
+    Durations of the same phase are added up. Does nothing but a flag
+    check while timing is disabled.
+'''
+
+
+class phase():
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+        self.started = None
+
+    def __enter__(self):
+        if enabled:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.started is not None:
+            record(self.name, time.perf_counter() - self.started)
+
+
+def timed(name):
+    """Decorator measuring every call of a function as the phase name."""
+    def timed_decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return f(*args, **kwargs)
+            with phase(name):
+                return f(*args, **kwargs)
+
+        return wrapper
+
+    return timed_decorator
+
+
+def timed_stream(name, iterable):
+    """Measures the iteration of a streamed body. It ends after the headers
+    are sent, so it only reaches the metrics, not Server-Timing."""
+    started = time.perf_counter()
+    try:
+        for item in iterable:
+            yield item
+    finally:
+        metrics.observe(name, time.perf_counter() - started)
+
+
+def server_timing(timings):
+    return ', '.join(
+        '%s;dur=%.2f;desc="%s"' % (
+            name, seconds * 1000, PHASES.get(name, name))
+        for name, seconds in timings.items()
+    )
+
+
+def _timed_template_class(base):
+    class TimedTemplate(base):
+        def render(self, *args, **kwargs):
+            with phase('render'):
+                return super().render(*args, **kwargs)
+
+    return TimedTemplate
+
+
+'''
+init_app(app)
+    enables the phase timing when TIMING_ENABLED is set: every response
+    gets a Server-Timing header and the durations are aggregated in
+    metrics. Left disabled, no hook is installed at all.
+'''
+
+
+def init_app(app):
+    global enabled
+    if not app.config.get('TIMING_ENABLED', False):
+        return
+    enabled = True
+    app.jinja_env.template_class = _timed_template_class(
+        app.jinja_env.template_class)
+
+    @app.before_request
+    def start_request_timing():
+        g.phase_timings = {}
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def add_server_timing(response):
+        timings = g.pop('phase_timings', None)
+        if timings is None:
+            return response
+        total = time.perf_counter() - g.pop('request_started')
+        metrics.observe('total', total)
+        timings['total'] = total
+        response.headers['Server-Timing'] = server_timing(timings)
+        return response
@@ -0,0 +1,4 @@
+"""Offline benchmarks of the calendar frontend.
+
+Every module can be run on its own, e.g. ``python -m benchmarks.recurrence``.
+"""
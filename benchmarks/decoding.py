@@ -0,0 +1,168 @@
+""" Backend response decoding benchmark
+
+Fetches months of several sizes from the stub backend and places their
+tasks, decoding the body with requests' .json(), with decoding.loads
+(orjson when installed) and streamed (decoding.StreamedResponse into
+place_task_stream). Reports the median time and the peak memory
+(tracemalloc, in separate runs) of every mode. The stub backend runs
+in its own process, out of the measured memory:
+
+    python -m benchmarks.decoding
+    python -m benchmarks.decoding --tasks 1000 20000 --runs 10
+
+--check decodes sample bodies streamed one byte at a time instead, and
+fails if any differs from json.loads:
+
+    python -m benchmarks.decoding --check
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import requests
+
+from app.mod_calendar import decoding
+from app.mod_calendar.recurrence import place_task_stream, place_tasks
+from benchmarks.suite import ROOT
+from stubs.data import synthetic_tasks
+
+MODES = ('json', 'loads', 'stream')
+CHUNK_SIZE = 64 * 1024
+# Bodies whose values end where a chunk may end
+CHECK_BODIES = (
+    b'{"tasks":[1.5,2],"v":3.25}',
+    b'{"tasks": [ -0.5e-3 , 1E+2 ,true,null, "a\\"b\\u00e9"],\n "v":[1.0]}',
+    b'{"v": {"x": 10}, "tasks": [{"n": 12.75, "s": "\xc3\xa9t\xc3\xa9"}]}',
+    b'{"tasks": [], "v": 7}',
+    b'{}',
+)
+
+
+def start_stub(tasks):
+    """The stub backend with a calendar of tasks in the current month."""
+    process = subprocess.Popen(
+        [sys.executable, '-u', '-m', 'stubs.backend', '--port', '0',
+         '--tasks', str(tasks)],
+        cwd=ROOT, stdout=subprocess.PIPE, universal_newlines=True)
+    line = process.stdout.readline()
+    if not line.startswith('API_URL='):
+        process.terminate()
+        raise RuntimeError('the stub backend did not start')
+    return process, line.split('=', 1)[1].split()[0]
+
+
+def fetch_and_place(session, url, mode):
+    now = datetime.now()
+    if mode == 'stream':
+        response = session.get(url, stream=True)
+        streamed = decoding.StreamedResponse(
+            response.iter_content(CHUNK_SIZE), 'tasks',
+            required=('calendar',), close=response.close)
+        calendar = streamed.fields['calendar']
+        return place_task_stream(
+            streamed.elements, now.year, now.month,
+            calendar['week_starting_day'])
+    response = session.get(url)
+    if mode == 'json':
+        data = response.json()
+    else:
+        data = decoding.loads(response.content)
+    return place_tasks(data['tasks'], now.year, now.month,
+                       data['calendar']['week_starting_day'])
+
+
+def measure(session, url, mode, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fetch_and_place(session, url, mode)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fetch_and_place(session, url, mode)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def check():
+    """Names of the bodies iter_members decodes differently from
+    json.loads when they are received one byte at a time."""
+    now = datetime.now()
+    bodies = list(CHECK_BODIES)
+    bodies.append(json.dumps({
+        'success': True,
+        'tasks': synthetic_tasks(50, now.year, now.month),
+        'calendar': {'week_starting_day': 0}
+    }).encode('utf-8'))
+    failed = []
+    for body in bodies:
+        expected = json.loads(body.decode('utf-8'))
+        chunks = [body[i:i + 1] for i in range(len(body))]
+        decoded = {}
+        try:
+            for key, value, is_element in decoding.iter_members(
+                    chunks, 'tasks'):
+                if is_element:
+                    decoded.setdefault(key, []).append(value)
+                else:
+                    decoded[key] = value
+        except ValueError as e:
+            print(e)
+        if 'tasks' in expected:
+            # An empty array yields no element
+            decoded.setdefault('tasks', [])
+        if decoded != expected:
+            failed.append(body[:40].decode('utf-8', 'replace'))
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, nargs='+',
+                        default=[1000, 10000, 50000])
+    parser.add_argument('--mode', nargs='+', choices=MODES,
+                        default=list(MODES))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--check', action='store_true',
+                        help='decode sample bodies one byte at a time')
+    args = parser.parse_args()
+
+    if args.check:
+        failed = check()
+        if failed:
+            sys.exit('Decoded differently: %s' % ', '.join(failed))
+        print('Bodies decoded as json.loads does')
+        return
+
+    session = requests.Session()
+    print('decoding.loads uses %s' % (
+        'orjson' if decoding.orjson is not None else 'json'))
+    print('%8s %10s %8s %12s %12s %12s' % (
+        'tasks', 'body KB', 'mode', 'median ms', 'tasks/s', 'peak KB'))
+    try:
+        for count in args.tasks:
+            process, api_url = start_stub(count)
+            try:
+                url = '%sapi/calendars/1/tasks/' % api_url
+                size = len(session.get(url).content)
+                for mode in args.mode:
+                    elapsed, peak = measure(session, url, mode, args.runs)
+                    print('%8d %10.0f %8s %12.1f %12.0f %12.0f' % (
+                        count, size / 1024, mode, elapsed * 1000,
+                        count / elapsed, peak / 1024))
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+""" Recurrence expansion of the month view
+
+Checks that place_tasks (lookup and NumPy paths) places exactly the same
+occurrences as the original per-task grid walk of get_calendar_id, then
+times the three implementations.
+
+    python -m benchmarks.recurrence [--tasks 100 1000 5000]
+"""
+import argparse
+import calendar
+import itertools
+import timeit
+from datetime import datetime
+
+from app.mod_calendar import recurrence
+from app.mod_calendar.recurrence import place_tasks
+from stubs.data import synthetic_tasks
+
+
+def legacy_place_tasks(response_tasks, year, month, week_starting_day,
+                       view_past_tasks, now):
+    """Placement loop of get_calendar_id before the recurrence module."""
+    def _add_task_to_task_list(
+        tasks_list,
+        day,
+        month,
+        task,
+        view_past_tasks=True
+    ):
+        if not view_past_tasks:
+            start_time = now
+            end_time = datetime.strptime(
+                task['end_time'], '%Y-%m-%d, %H:%M:%S')
+            task_end_time = datetime(
+                start_time.year,
+                month, day,
+                end_time.hour,
+                end_time.minute,
+                end_time.second
+            )
+            if task_end_time < start_time:
+                return
+        if month not in tasks_list:
+            tasks_list[month] = {}
+        if day not in tasks_list[month]:
+            tasks_list[month][day] = []
+        tasks_list[month][day].append(task)
+
+    def month_days_with_weekday(year, month):
+        return calendar.Calendar(week_starting_day).monthdayscalendar(
+            year, month)
+
+    tasks = {}
+    for task in response_tasks:
+        if task['is_recurrent']:
+            monthly_repetition_done = False
+            for week in month_days_with_weekday(year, month):
+                for weekday, day in enumerate(week):
+                    if day == 0:
+                        continue
+                    if task['repetition_type'] == 'w':
+                        if task['repetition_value'] == weekday:
+                            _add_task_to_task_list(
+                                tasks, day, month, task, view_past_tasks)
+                    elif task['repetition_type'] == 'm':
+                        if task['repetition_subtype'] == 'w':
+                            if (
+                                task['repetition_value'] == weekday
+                                and not monthly_repetition_done
+                            ):
+                                _add_task_to_task_list(
+                                    tasks, day, month, task, view_past_tasks)
+                                monthly_repetition_done = True
+                        elif task['repetition_subtype'] == 'm':
+                            if task['repetition_value'] == day:
+                                _add_task_to_task_list(
+                                    tasks, day, month, task, view_past_tasks)
+        else:
+            start_time = datetime.strptime(
+                task['start_time'], '%Y-%m-%d, %H:%M:%S')
+            _add_task_to_task_list(
+                tasks, start_time.day, start_time.month, task)
+    return tasks
+
+
+def _as_ids(tasks_list):
+    return {
+        month: {day: [task['id'] for task in tasks]
+                for day, tasks in days.items()}
+        for month, days in tasks_list.items()
+    }
+
+
+def check(task_count=300):
+    """Differential check over months, week starts and past filtering."""
+    numpy_paths = (False, True) if recurrence.numpy is not None else (False,)
+    checked = 0
+    for year, month in itertools.product((2019, 2020, 2021), range(1, 13)):
+        tasks = synthetic_tasks(task_count, year, month, seed=year + month)
+        # Values the backend should not send, the rules must still agree
+        tasks[0].update(is_recurrent=True, repetition_type='w',
+                        repetition_value=9)
+        tasks[1].update(is_recurrent=True, repetition_type='m',
+                        repetition_subtype='m', repetition_value=31)
+        tasks[2].update(is_recurrent=True, repetition_type='x')
+        for first_weekday, view_past_tasks, vectorized in itertools.product(
+                range(7), (True, False), numpy_paths):
+            now = datetime(year, month, 15, 12, 30, 15)
+            expected = legacy_place_tasks(
+                tasks, year, month, first_weekday, view_past_tasks, now)
+            placed = place_tasks(
+                tasks, year, month, first_weekday, view_past_tasks, now,
+                vectorize_min_tasks=0 if vectorized else len(tasks) + 1)
+            if _as_ids(placed) != _as_ids(expected):
+                raise AssertionError(
+                    'Placement differs for %d-%02d, first weekday %d, '
+                    'view past %s, vectorized %s' % (
+                        year, month, first_weekday, view_past_tasks,
+                        vectorized))
+            checked += 1
+    return checked
+
+
+def bench(task_counts, repeat=5):
+    year, month = 2020, 8
+    now = datetime(year, month, 15, 12, 0, 0)
+    print('%8s %14s %14s %14s' % ('tasks', 'legacy ms', 'lookup ms',
+                                  'numpy ms'))
+    for count in task_counts:
+        tasks = synthetic_tasks(count, year, month)
+        timings = []
+        for vectorize_min_tasks in (None, count + 1, 0):
+            if vectorize_min_tasks is None:
+                def run():
+                    legacy_place_tasks(tasks, year, month, 0, False, now)
+            elif vectorize_min_tasks == 0 and recurrence.numpy is None:
+                timings.append(float('nan'))
+                continue
+            else:
+                def run(limit=vectorize_min_tasks):
+                    place_tasks(tasks, year, month, 0, False, now,
+                                vectorize_min_tasks=limit)
+            number = max(1, 2000 // count)
+            best = min(timeit.repeat(run, number=number, repeat=repeat))
+            timings.append(best / number * 1000)
+        print('%8d %14.3f %14.3f %14.3f' % ((count,) + tuple(timings)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, nargs='+',
+                        default=[100, 1000, 5000])
+    args = parser.parse_args()
+    print('Differential check: %d placements identical' % check())
+    bench(args.tasks)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+""" Session store benchmark
+
+Size of the session cookie of a logged-in user (Auth0 user info, profile,
+access token and CSRF token) and the time requests spend loading and
+saving the session, with Flask's signed cookies and with every
+server-side store of app/sessions.py:
+
+    python -m benchmarks.sessions
+    python -m benchmarks.sessions --requests 5000 --store cookie sqlite
+"""
+import argparse
+import os
+import secrets
+import shutil
+import statistics
+import tempfile
+import time
+
+from flask import session
+from jose import jwt
+
+import config
+
+STORES = ('cookie', 'memory', 'file', 'sqlite')
+
+# Settings the frontend needs at import time
+os.environ.setdefault('AUTH0_DOMAIN', 'stub.auth0.invalid')
+os.environ.setdefault('AUTH0_CALLBACK_URL', 'http://127.0.0.1/callback/')
+os.environ.setdefault('ALGORITHMS', 'RS256')
+os.environ.setdefault('API_AUDIENCE', 'calendar')
+
+
+def logged_in_session():
+    """The session callback_handling stores, with an access token of the
+    size of an Auth0 RS256 one."""
+    userinfo = {
+        'sub': 'auth0|' + secrets.token_hex(12),
+        'nickname': 'managercalendar',
+        'name': 'managercalendar@udacity.com',
+        'picture': 'https://s.gravatar.com/avatar/%s?s=480&r=pg&d=https'
+                   '%%3A%%2F%%2Fcdn.auth0.com%%2Favatars%%2Fma.png'
+                   % secrets.token_hex(16),
+        'updated_at': '2020-08-01T10:00:00.000Z',
+        'email': 'managercalendar@udacity.com',
+        'email_verified': True
+    }
+    now = int(time.time())
+    token = jwt.encode({
+        'iss': 'https://stub.auth0.invalid/',
+        'sub': userinfo['sub'],
+        'aud': ['calendar', 'https://stub.auth0.invalid/userinfo'],
+        'iat': now,
+        'exp': now + 86400,
+        'azp': secrets.token_urlsafe(24),
+        'scope': 'openid profile email',
+        'permissions': ['delete:tasks', 'get:calendars', 'get:tasks',
+                        'patch:tasks', 'post:tasks'],
+        # Stands for the 256 bytes RSA signature
+        'sig': secrets.token_urlsafe(256)
+    }, 'benchmarks', algorithm='HS256')
+    return {
+        'jwt_payload': userinfo,
+        'profile': {
+            'user_id': userinfo['sub'],
+            'name': userinfo['name'],
+            'picture': userinfo['picture']
+        },
+        'jwt_token': token,
+        'csrf_token': secrets.token_hex(20)
+    }
+
+
+def make_app(store, directory):
+    from app import create_app
+
+    config.SESSION_STORE = None if store == 'cookie' else store
+    config.SESSION_SQLITE_PATH = os.path.join(directory, 'sessions.sqlite')
+    config.SESSION_FILE_DIR = os.path.join(directory, 'sessions')
+    app = create_app()
+
+    @app.route('/bench/session/read')
+    def read_session():
+        return session.get('profile', {}).get('name', '')
+
+    @app.route('/bench/session/write')
+    def write_session():
+        session['visits'] = session.get('visits', 0) + 1
+        return ''
+
+    return app
+
+
+def timed_requests(client, path, requests):
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.get(path)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run(store, requests, directory):
+    app = make_app(store, directory)
+    client = app.test_client()
+    with client.session_transaction() as client_session:
+        client_session.update(logged_in_session())
+    cookie = next(cookie.value for cookie in client.cookie_jar
+                  if cookie.name == app.config['SESSION_COOKIE_NAME'])
+    reads = timed_requests(client, '/bench/session/read', requests)
+    writes = timed_requests(client, '/bench/session/write', requests)
+    return len(cookie), statistics.median(reads), statistics.median(writes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--store', nargs='+', choices=STORES,
+                        default=list(STORES))
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        print('%-8s %14s %14s %14s' % (
+            'store', 'cookie bytes', 'read p50 us', 'write p50 us'))
+        for store in args.store:
+            size, read, write = run(store, args.requests, directory)
+            print('%-8s %14d %14.1f %14.1f' % (
+                store, size, read * 1e6, write * 1e6))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+""" Cold start benchmark of the calendar frontend
+
+Measures, in fresh interpreters, the import time of the app package, the
+time create_app takes and the time to the first response (the home page
+and the Auth0 login redirect, through the Flask test client), eagerly and
+with LAZY_INIT. With --gunicorn, also the time from spawning gunicorn to
+its first 200 response. Reports the median of the runs and exits with 1
+when a limit is exceeded, to catch regressions:
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 10 --gunicorn
+    python -m benchmarks.startup --mode lazy --max-first-response-ms 800
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ('eager', 'lazy')
+MEASURES = ('import', 'create_app', 'first_response', 'login')
+
+
+def child(mode, api_url):
+    """Runs in the fresh interpreter: prints the timings as JSON. Nothing
+    else is imported first, the modules the app shares with the benchmarks
+    would not be counted."""
+    os.environ['API_URL'] = api_url
+    # Settings the frontend needs at import time
+    os.environ.setdefault('AUTH0_DOMAIN', 'stub.auth0.invalid')
+    os.environ.setdefault('AUTH0_CALLBACK_URL', 'http://127.0.0.1/callback/')
+    os.environ.setdefault('ALGORITHMS', 'RS256')
+    os.environ.setdefault('API_AUDIENCE', 'calendar')
+    import config
+    config.LAZY_INIT = mode == 'lazy'
+
+    start = time.perf_counter()
+    import app as package
+    imported = time.perf_counter()
+    app = package.app
+    created = time.perf_counter()
+    client = app.test_client()
+    status = client.get('/').status_code
+    responded = time.perf_counter()
+    login_status = client.get('/auth/login').status_code
+    logged_in = time.perf_counter()
+    if status >= 500 or login_status != 302:
+        raise RuntimeError('unexpected statuses %d, %d' % (
+            status, login_status))
+    print(json.dumps({
+        'import': imported - start,
+        'create_app': created - imported,
+        'first_response': responded - start,
+        'login': logged_in - responded
+    }))
+
+
+def run_child(mode, api_url):
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.startup', '--child', mode,
+         '--api-url', api_url],
+        cwd=ROOT, stdout=subprocess.PIPE, check=True).stdout
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def gunicorn_first_response(mode, api_url, workers):
+    """Seconds from spawning gunicorn to its first 200 response."""
+    import requests
+    from benchmarks.suite import _free_port
+
+    port = _free_port()
+    env = dict(os.environ, API_URL=api_url,
+               BENCH_CONFIG=json.dumps({'LAZY_INIT': mode == 'lazy'}))
+    base_url = 'http://127.0.0.1:%d/' % port
+    start = time.perf_counter()
+    process = subprocess.Popen([
+        sys.executable, '-m', 'gunicorn.app.wsgiapp',
+        '--workers', str(workers),
+        '--bind', '127.0.0.1:%d' % port,
+        '--log-level', 'warning',
+        'benchmarks.wsgi:app'
+    ], cwd=ROOT, env=env)
+    try:
+        while time.perf_counter() - start < 60:
+            try:
+                if requests.get(base_url, timeout=5).status_code == 200:
+                    return time.perf_counter() - start
+            except requests.exceptions.RequestException:
+                pass
+            if process.poll() is not None:
+                break
+            time.sleep(0.01)
+        raise RuntimeError('gunicorn did not start')
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', nargs='+', choices=MODES,
+                        default=list(MODES))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--gunicorn', action='store_true',
+                        help='also measure the boot of gunicorn')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--max-import-ms', type=float)
+    parser.add_argument('--max-first-response-ms', type=float)
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--api-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.api_url)
+        return
+
+    from stubs.backend import StubServer
+
+    server = StubServer().start()
+    failures = []
+    try:
+        print('%-6s %10s %12s %16s %10s %10s' % (
+            'mode', 'import ms', 'create ms', 'first resp ms', 'login ms',
+            'gunicorn ms'))
+        for mode in args.mode:
+            runs = [run_child(mode, server.url) for _ in range(args.runs)]
+            medians = {
+                measure: statistics.median(run[measure] for run in runs)
+                * 1000 for measure in MEASURES}
+            boot = ''
+            if args.gunicorn:
+                boot = '%.0f' % (statistics.median(
+                    gunicorn_first_response(mode, server.url, args.workers)
+                    for _ in range(args.runs)) * 1000)
+            print('%-6s %10.1f %12.1f %16.1f %10.1f %10s' % (
+                mode, medians['import'], medians['create_app'],
+                medians['first_response'], medians['login'], boot))
+            for measure, limit in (
+                    ('import', args.max_import_ms),
+                    ('first_response', args.max_first_response_ms)):
+                if limit is not None and medians[measure] > limit:
+                    failures.append('%s %s: %.1f ms > %.1f ms' % (
+                        mode, measure, medians[measure], limit))
+    finally:
+        server.stop()
+
+    for failure in failures:
+        print('Regression:', failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+""" End to end benchmarks of the calendar frontend
+
+Starts the stub backend (stubs/backend.py) with calendars of several
+sizes and recurrence mixes, then drives the frontend through the Flask
+test client and through a real gunicorn server, reporting throughput and
+p50/p95/p99 latencies of the month view, the task forms, task creation,
+calendar edition and task moves (the batch endpoint, then the month view
+the move invalidates).
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --tasks 100 1000 --mix mixed --requests 100
+    python -m benchmarks.suite --driver gunicorn --workers 2 --threads 4
+"""
+import argparse
+import itertools
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from stubs.backend import StubBackend, StubServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+YEAR, MONTH = 2020, 8
+
+MIXES = {
+    'single': (((False, '', ''), 1),),
+    'mixed': (
+        ((False, '', ''), 4),
+        ((True, 'w', ''), 3),
+        ((True, 'm', 'w'), 1),
+        ((True, 'm', 'm'), 2),
+    ),
+    'recurrent': (
+        ((True, 'w', ''), 2),
+        ((True, 'm', 'w'), 1),
+        ((True, 'm', 'm'), 1),
+    ),
+}
+FLOWS = ('month', 'task_form', 'task_edit', 'create', 'calendar_edit',
+         'task_move')
+CSRF_TOKEN_REGEX = re.compile(rb'var csrf_token = "([^"]+)"')
+
+# Settings the frontend needs at import time
+os.environ.setdefault('AUTH0_DOMAIN', 'stub.auth0.invalid')
+os.environ.setdefault('AUTH0_CALLBACK_URL', 'http://127.0.0.1/callback/')
+os.environ.setdefault('ALGORITHMS', 'RS256')
+os.environ.setdefault('API_AUDIENCE', 'calendar')
+# One key for every worker, so the session works across them
+os.environ.setdefault('SECRET_KEY', 'benchmarks-secret-key')
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+class TestClientDriver():
+    name = 'test-client'
+
+    def __init__(self, app):
+        self.client = app.test_client()
+        self.concurrency = 1
+
+    def request(self, method, path, data=None, headers=None):
+        response = self.client.open(
+            path, method=method, data=data, headers=headers)
+        return response.status_code, response.get_data()
+
+
+class HTTPDriver():
+    name = 'gunicorn'
+
+    def __init__(self, base_url, concurrency):
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self._local = threading.local()
+
+    def request(self, method, path, data=None, headers=None):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        response = session.request(
+            method, self.base_url + path, data=data, headers=headers,
+            allow_redirects=False, timeout=60)
+        return response.status_code, response.content
+
+
+class Scenario():
+    def __init__(self, backend, task_count, mix):
+        self.task_count = task_count
+        self.mix = mix
+        self.calendar_id = backend.add_calendar(
+            '%d tasks, %s' % (task_count, mix))
+        backend.seed(self.calendar_id, task_count, YEAR, MONTH, MIXES[mix])
+        # Writes go to their own calendar so the month payload stays stable
+        self.scratch_id = backend.add_calendar('scratch')
+        self.task_id = next(
+            task_id for task_id, task in backend.tasks.items()
+            if task['calendar_id'] == self.calendar_id)
+
+
+class Flows():
+    """The requests of every flow. Write flows send the CSRF token of the
+    session, as a browser would."""
+
+    def __init__(self, driver, scenario):
+        self.driver = driver
+        self.scenario = scenario
+        self._tokens = threading.local()
+        self._moves = itertools.count()
+
+    def _csrf_headers(self):
+        token = getattr(self._tokens, 'token', None)
+        if token is None:
+            _, body = self.driver.request(
+                'GET', '/calendar/%d/tasks?year=%d&month=%d' % (
+                    self.scenario.scratch_id, YEAR, MONTH))
+            match = CSRF_TOKEN_REGEX.search(body)
+            token = self._tokens.token = \
+                match.group(1).decode() if match else ''
+        return {'X-CSRFToken': token}
+
+    def prepare(self, flow):
+        if flow in ('create', 'calendar_edit', 'task_move'):
+            self._csrf_headers()
+
+    def month(self):
+        return self.driver.request(
+            'GET', '/calendar/%d/?y=%d&m=%d' % (
+                self.scenario.calendar_id, YEAR, MONTH))
+
+    def task_form(self):
+        return self.driver.request(
+            'GET', '/calendar/%d/tasks?year=%d&month=%d&day=1' % (
+                self.scenario.calendar_id, YEAR, MONTH))
+
+    def task_edit(self):
+        return self.driver.request(
+            'GET', '/calendar/%d/tasks/%d?year=%d&month=%d' % (
+                self.scenario.calendar_id, self.scenario.task_id, YEAR,
+                MONTH))
+
+    def create(self):
+        return self.driver.request(
+            'POST', '/calendar/%d/tasks' % self.scenario.scratch_id,
+            data={
+                'title': 'Benchmark task',
+                'start_date': '%d-%02d-10' % (YEAR, MONTH),
+                'end_date': '%d-%02d-10' % (YEAR, MONTH),
+                'start_time': '10:00:00',
+                'end_time': '11:00:00',
+                'details': 'https://example.com/benchmark',
+                'color': '#3EB34F',
+                'repetition_value': '0'
+            },
+            headers=self._csrf_headers())
+
+    def calendar_edit(self):
+        return self.driver.request(
+            'POST', '/calendar/%d/edit' % self.scenario.scratch_id,
+            data={
+                'calendar_id': str(self.scenario.scratch_id),
+                'name': 'scratch',
+                'description': '',
+                'min_year': '1900',
+                'max_year': '2200',
+                'time_zone': 'Europe/Madrid',
+                'week_starting_day': '0',
+                'emojis_enabled': 'y',
+                'show_view_past_btn': 'y'
+            },
+            headers=self._csrf_headers())
+
+    def task_move(self):
+        """Drag-and-drop of a task of the measured calendar to another
+        day, then the month view: the write evicts (or expires) its
+        months, so the view pays the refetch or delta sync and a new
+        page ETag."""
+        headers = dict(self._csrf_headers())
+        headers['Content-Type'] = 'application/json'
+        status, body = self.driver.request(
+            'POST', '/calendar/%d/tasks/batch' % self.scenario.calendar_id,
+            data=json.dumps({'tasks': [{
+                'id': self.scenario.task_id,
+                'newDay': 10 + next(self._moves) % 2
+            }]}),
+            headers=headers)
+        if status >= 400 or not json.loads(body.decode('utf-8'))['success']:
+            return max(status, 500), body
+        return self.month()
+
+
+def measure(driver, flows, flow, count, warmup=3):
+    run = getattr(flows, flow)
+    flows.prepare(flow)
+    for _ in range(warmup):
+        run()
+
+    def timed(_):
+        # Per thread setup (the CSRF token) stays out of the timing
+        flows.prepare(flow)
+        started = time.perf_counter()
+        status, _ = run()
+        return time.perf_counter() - started, status
+
+    started = time.perf_counter()
+    if driver.concurrency > 1:
+        with ThreadPoolExecutor(driver.concurrency) as executor:
+            results = list(executor.map(timed, range(count)))
+    else:
+        results = [timed(i) for i in range(count)]
+    elapsed = time.perf_counter() - started
+    latencies = [latency for latency, _ in results]
+    errors = sum(1 for _, status in results if status >= 400)
+    return {
+        'throughput': count / elapsed,
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'errors': errors
+    }
+
+
+def report_header():
+    print('%-12s %-13s %6s %-10s %9s %9s %9s %9s %6s' % (
+        'driver', 'flow', 'tasks', 'mix', 'req/s', 'p50 ms', 'p95 ms',
+        'p99 ms', 'errors'))
+
+
+def report(driver, flow, scenario, result):
+    """Prints the result of a flow, without timings when any request
+    failed: the timings of error pages are not those of the flow."""
+    if result['errors']:
+        print('%-12s %-13s %6d %-10s %9s %9s %9s %9s %6d' % (
+            driver.name, flow, scenario.task_count, scenario.mix,
+            '-', '-', '-', '-', result['errors']))
+    else:
+        print('%-12s %-13s %6d %-10s %9.1f %9.2f %9.2f %9.2f %6d' % (
+            driver.name, flow, scenario.task_count, scenario.mix,
+            result['throughput'], result['p50'], result['p95'],
+            result['p99'], result['errors']))
+    sys.stdout.flush()
+    return not result['errors']
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(api_url, workers, threads, bench_config):
+    port = _free_port()
+    env = dict(os.environ, API_URL=api_url,
+               BENCH_CONFIG=json.dumps(bench_config))
+    process = subprocess.Popen([
+        sys.executable, '-m', 'gunicorn.app.wsgiapp',
+        '--workers', str(workers),
+        '--threads', str(threads),
+        '--worker-class', 'gthread',
+        '--bind', '127.0.0.1:%d' % port,
+        '--log-level', 'warning',
+        'benchmarks.wsgi:app'
+    ], cwd=ROOT, env=env)
+    base_url = 'http://127.0.0.1:%d' % port
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(base_url + '/calendar/', timeout=5)
+            return process, base_url
+        except requests.exceptions.RequestException:
+            if process.poll() is not None:
+                break
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--driver', choices=('test-client', 'gunicorn',
+                                             'all'), default='all')
+    parser.add_argument('--tasks', type=int, nargs='+',
+                        default=[100, 1000, 5000])
+    parser.add_argument('--mix', nargs='+', choices=sorted(MIXES),
+                        default=sorted(MIXES))
+    parser.add_argument('--flows', nargs='+', choices=FLOWS,
+                        default=list(FLOWS))
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--cache', action='store_true',
+                        help='keep the backend response cache enabled')
+    args = parser.parse_args()
+
+    backend = StubBackend()
+    scenarios = [Scenario(backend, count, mix)
+                 for count in args.tasks for mix in args.mix]
+    server = StubServer(backend).start()
+    os.environ['API_URL'] = server.url
+    bench_config = {'WTF_CSRF_ENABLED': True}
+    if not args.cache:
+        bench_config['API_CACHE_TTL'] = 0
+
+    passed = True
+    report_header()
+    try:
+        if args.driver in ('test-client', 'all'):
+            from app import app
+            app.config.update(bench_config)
+            driver = TestClientDriver(app)
+            for scenario in scenarios:
+                flows = Flows(driver, scenario)
+                for flow in args.flows:
+                    passed &= report(
+                        driver, flow, scenario,
+                        measure(driver, flows, flow, args.requests))
+
+        if args.driver in ('gunicorn', 'all'):
+            process, base_url = start_gunicorn(
+                server.url, args.workers, args.threads, bench_config)
+            try:
+                driver = HTTPDriver(base_url, args.concurrency)
+                for scenario in scenarios:
+                    flows = Flows(driver, scenario)
+                    for flow in args.flows:
+                        passed &= report(
+                            driver, flow, scenario,
+                            measure(driver, flows, flow, args.requests))
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        server.stop()
+    if not passed:
+        sys.exit('Requests failed, their flows have no timings')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+""" Backend timestamp parsing
+
+Parses the start and end times of a synthetic 10k-task payload with
+datetime.strptime, with the fixed-layout parser (cold cache) and with
+the cached parser, as the month view does.
+
+    python -m benchmarks.timestamps [--tasks 10000]
+"""
+import argparse
+import timeit
+from datetime import datetime
+
+from app.mod_calendar.timestamps import (
+    BACKEND_TIME_FORMAT,
+    _parse_fixed_layout,
+    parse_backend_time
+)
+from stubs.data import synthetic_tasks
+
+
+def bench(task_count, repeat=5):
+    tasks = synthetic_tasks(task_count, 2020, 8)
+    values = [task[key] for task in tasks for key in ('start_time',
+                                                      'end_time')]
+    for value in values:
+        assert _parse_fixed_layout(value) == \
+            datetime.strptime(value, BACKEND_TIME_FORMAT)
+
+    def strptime():
+        for value in values:
+            datetime.strptime(value, BACKEND_TIME_FORMAT)
+
+    def fixed_layout():
+        for value in values:
+            _parse_fixed_layout(value)
+
+    def cached():
+        for value in values:
+            parse_backend_time(value)
+
+    print('%d timestamps, %d distinct' % (len(values), len(set(values))))
+    baseline = None
+    for name, run in (('strptime', strptime),
+                      ('fixed layout', fixed_layout),
+                      ('cached', cached)):
+        best = min(timeit.repeat(run, number=1, repeat=repeat)) * 1000
+        baseline = baseline or best
+        print('%14s %10.3f ms %8.1fx' % (name, best, baseline / best))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=10000)
+    args = parser.parse_args()
+    bench(args.tasks)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+""" WSGI entry point of the benchmarks
+
+The application of app/__init__.py with the settings of the BENCH_CONFIG
+environment variable (a JSON object) applied on top, e.g. to disable the
+response cache of a gunicorn run:
+
+    BENCH_CONFIG='{"API_CACHE_TTL": 0}' gunicorn benchmarks.wsgi:app
+"""
+import json
+import os
+
+import config
+
+bench_config = json.loads(os.environ.get('BENCH_CONFIG', '{}'))
+# Also seen by create_app, for the settings used at startup (LAZY_INIT)
+vars(config).update(bench_config)
+
+from app import app  # noqa: E402
+
+app.config.update(bench_config)
@@ -1,13 +1,119 @@
 import os
+import tempfile
 
 # Statement for enabling the development environment
 DEBUG = True
 WTF_CSRF_ENABLED = True
 SQLALCHEMY_DATABASE_URI = 'postgresql://acrespo@localhost:5432/calendarapp'
-# Secret key for signing cookies
-SECRET_KEY = os.urandom(32)
+# Secret key for signing cookies and CSRF tokens: the SECRET_KEY environment
+# variable, else one shared by the workers through the session store, else
+# random per worker process
+SECRET_KEY = None
 API_URL = 'http://localhost:5000/'
 
+# Backend HTTP client: keep-alive connection pool per worker process
+API_POOL_CONNECTIONS = 10
+API_POOL_MAXSIZE = 10
+API_POOL_BLOCK = False
+# Timeouts in seconds
+API_CONNECT_TIMEOUT = 3.05
+API_READ_TIMEOUT = 10
+# Retries (with exponential backoff) for idempotent requests only
+API_MAX_RETRIES = 2
+API_RETRY_BACKOFF = 0.2
+# Threads sending independent backend calls of a page concurrently,
+# keep it lower or equal than API_POOL_MAXSIZE
+API_FANOUT_WORKERS = 8
+# Most task moves or edits in one request to /calendar/<id>/tasks/batch
+API_BATCH_MAX_ITEMS = 100
+# Cache of backend GET responses (per worker process), evicted on writes.
+# The TTL bounds how stale a month can be in the other workers.
+API_CACHE_SIZE = 512
+API_CACHE_TTL = 30
+# Sync the expired cached months with the backend (?since=<version>): only
+# the tasks changed since are fetched and merged into them. After a write,
+# the months of the calendar are expired instead of dropped.
+API_DELTA_SYNC = True
+# Month responses of at least API_STREAM_MIN_BYTES bytes are decoded while
+# they are received, their tasks placed one at a time, instead of being
+# read and decoded whole (and cached): flat memory for the largest
+# months. 0 never streams.
+API_STREAM_MIN_BYTES = 2 * 1024 * 1024
+
+# ETags on the calendar pages, derived from the backend payloads: the
+# browsers get a 304 without the page being rendered when nothing changed
+PAGE_ETAGS = True
+
+# Bundle and fingerprint the static assets (app/assets.py) when the app
+# starts, instead of only at deploy time
+ASSETS_BUILD_ON_STARTUP = True
+
+# Serve the static files from memory: files up to STATIC_STORE_MAX_FILE_SIZE
+# bytes, STATIC_STORE_MAX_MEMORY_SIZE in total, are loaded at startup. With
+# STATIC_STORE_MMAP the other ones are read through memory maps.
+STATIC_STORE_ENABLED = True
+STATIC_STORE_MAX_FILE_SIZE = 256 * 1024
+STATIC_STORE_MAX_MEMORY_SIZE = 16 * 1024 * 1024
+STATIC_STORE_MMAP = False
+
+# Response compression: brotli when the brotli package is installed, else
+# gzip. Static files are compressed once, at startup.
+COMPRESS_ENABLED = True
+COMPRESS_MIN_SIZE = 500
+COMPRESS_LEVEL = 6
+COMPRESS_BROTLI_LEVEL = 4
+
+# Stream the calendar pages while they are rendered instead of building
+# the whole response first, chunks group STREAM_BUFFER_SIZE template parts
+STREAM_TEMPLATES = False
+STREAM_BUFFER_SIZE = 20
+
+# Maximum number of months of the /calendar/<id>/months view and of the
+# /calendar/<id>/occurrences.json data
+MAX_RANGE_MONTHS = 12
+
+# Expose the per worker statistics on /stats/ to the requests with the
+# header "X-Stats: <STATS_SECRET>". The secret comes from the environment.
+STATS_ENABLED = False
+STATS_SECRET = None
+
+# Measure the phases of every request (backend calls, JWT verification,
+# task placement, rendering): Server-Timing header and /metrics endpoint
+TIMING_ENABLED = False
+
+# Profile single requests on demand: requests with the header
+# "X-Profile: <PROFILING_SECRET>" run under cProfile, or under a stack
+# sampler with "X-Profile-Format: collapsed", and the profile is written
+# to PROFILING_DIR. The secret comes from the environment.
+PROFILING_ENABLED = False
+PROFILING_SECRET = None
+PROFILING_DIR = 'profiles'
+# Seconds between two stack samples, in practice bounded by the interpreter
+# switch interval (sys.getswitchinterval(), 5 ms by default)
+PROFILING_SAMPLE_INTERVAL = 0.001
+
+# Server-side sessions, opt-in: the session cookie only holds an opaque
+# id, the session data (Auth0 profile, access token) is kept by
+# SESSION_STORE: 'memory' (per worker process: a single worker only),
+# 'file' or 'sqlite' (shared by the workers of a single host, lost when
+# its disk is, e.g. on every Heroku dyno restart). None keeps Flask's
+# signed cookies, which work across hosts and dynos. Sessions with an
+# access token expire with it, the other ones SESSION_STORE_LIFETIME
+# seconds after their last change.
+SESSION_STORE = None
+SESSION_SQLITE_PATH = os.path.join(
+    tempfile.gettempdir(), 'calendar-frontend-sessions.sqlite')
+SESSION_FILE_DIR = os.path.join(
+    tempfile.gettempdir(), 'calendar-frontend-sessions')
+SESSION_STORE_MAX_ENTRIES = 10000
+SESSION_STORE_MAX_MEMORY_SIZE = 32 * 1024 * 1024
+SESSION_STORE_LIFETIME = 24 * 3600
+
+# Defer the database (Flask-SQLAlchemy, Flask-Migrate, bound on first use
+# of app.db) and the Auth0 client (Authlib, on the first login) instead of
+# setting them up when the app is created: faster worker boot
+LAZY_INIT = True
+
 # Colors for new task buttons
 BUTTON_CUSTOM_COLOR_VALUE = "#3EB34F"
 BUTTONS_COLORS_LIST = (
@@ -0,0 +1 @@
+"""Local stub servers used to run the frontend offline."""
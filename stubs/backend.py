@@ -0,0 +1,360 @@
+""" Local stub of the calendar backend API
+
+A small WSGI application serving synthetic calendars and tasks with the
+same JSON shape the frontend expects from the real backend, so every view
+can be exercised offline.
+
+The month requests emulate the delta sync protocol: their responses carry
+the version of the data in an X-Sync-Version header, and with
+?since=<version> only the tasks of the month changed since (changed) and
+the ids of the tasks deleted or moved out of it (deleted) are sent.
+
+    python -m stubs.backend --port 5000 --tasks 1000
+    python -m stubs.backend --seed-file tasks.jsonl
+
+then start the frontend with API_URL=http://127.0.0.1:5000/
+"""
+import argparse
+import calendar
+import itertools
+import json
+import re
+import threading
+from datetime import datetime
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+from werkzeug.wrappers import Request, Response
+
+from stubs.data import DEFAULT_MIX, synthetic_tasks
+
+TIME_FORMAT = '%Y-%m-%d, %H:%M:%S'
+
+
+def _error(status):
+    return {'success': False, 'error': status}
+
+
+def _json_body(request):
+    # The base Request of Werkzeug 1.0 has no get_json()
+    return json.loads(request.get_data(as_text=True))
+
+
+class StubBackend():
+    def __init__(self):
+        self.calendars = {}
+        self.tasks = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+        self.deltas = 0
+        # Sync versions: one counter for every write, the version of the
+        # last write of every task and of every deleted task
+        self.version = 0
+        self.task_versions = {}
+        self.deleted = {}
+        self.routes = [
+            ('GET', r'/api/calendars/$', self.list_calendars),
+            ('POST', r'/api/calendars/$', self.create_calendar),
+            ('GET', r'/api/calendars/(\d+)/$', self.get_calendar),
+            ('PATCH', r'/api/calendars/(\d+)/$', self.update_calendar),
+            ('DELETE', r'/api/calendars/(\d+)/$', self.delete_calendar),
+            ('GET', r'/api/calendars/(\d+)/tasks/$', self.month_tasks),
+            ('POST', r'/api/calendars/tasks/$', self.create_task),
+            ('GET', r'/api/calendars/tasks/(\d+)/$', self.get_task),
+            ('PATCH', r'/api/calendars/tasks/(\d+)/$', self.update_task),
+            ('DELETE', r'/api/calendars/tasks/(\d+)/$', self.delete_task),
+        ]
+
+    # Data
+
+    def add_calendar(self, name=None, week_starting_day=0,
+                     hide_past_tasks=True, **fields):
+        with self._lock:
+            calendar_id = next(self._ids)
+        self.calendars[calendar_id] = dict({
+            'id': calendar_id,
+            'name': name or 'Calendar %d' % calendar_id,
+            'description': '',
+            'date_created': datetime.now().strftime(TIME_FORMAT),
+            'min_year': 1900,
+            'max_year': 2200,
+            'time_zone': 'Europe/Madrid',
+            'week_starting_day': week_starting_day,
+            'emojis_enabled': True,
+            'show_view_past_btn': True,
+            'hide_past_tasks': hide_past_tasks
+        }, **fields)
+        return calendar_id
+
+    def add_task(self, calendar_id, task):
+        with self._lock:
+            task_id = next(self._ids)
+        task = dict(task, id=task_id, calendar_id=calendar_id)
+        self.tasks[task_id] = task
+        self.touch(task_id, calendar_id)
+        return task_id
+
+    def touch(self, task_id, calendar_id):
+        """Records a write of a task, for the delta syncs."""
+        with self._lock:
+            self.version += 1
+            if task_id in self.tasks:
+                self.task_versions[task_id] = self.version
+            else:
+                self.task_versions.pop(task_id, None)
+                self.deleted[task_id] = (calendar_id, self.version)
+
+    def seed(self, calendar_id, count, year, month, mix=DEFAULT_MIX,
+             seed=0):
+        for task in synthetic_tasks(count, year, month, mix, seed):
+            self.add_task(calendar_id, task)
+
+    def seed_from_jsonl(self, calendar_id, path, year, month):
+        """Tasks from a JSONL file: title and details (or body) come from
+        every record, the times and recurrence rules are synthetic unless
+        the record has them."""
+        with open(path) as records:
+            lines = [line for line in records if line.strip()]
+        tasks = synthetic_tasks(len(lines), year, month)
+        for task, line in zip(tasks, lines):
+            record = json.loads(line)
+            task['title'] = str(record.get('title', task['title']))[:128]
+            task['details'] = str(
+                record.get('details', record.get('body', task['details'])))
+            for key in ('start_time', 'end_time', 'is_all_day',
+                        'is_recurrent', 'repetition_type',
+                        'repetition_subtype', 'repetition_value', 'color'):
+                if key in record:
+                    task[key] = record[key]
+            self.add_task(calendar_id, task)
+
+    # API
+
+    def list_calendars(self, request):
+        return {
+            'success': True,
+            'calendars': list(self.calendars.values())
+        }
+
+    def create_calendar(self, request):
+        body = _json_body(request)
+        body.pop('id', None)
+        return {'success': True, 'calendar_id': self.add_calendar(**body)}
+
+    def get_calendar(self, request, calendar_id):
+        if calendar_id not in self.calendars:
+            return _error(404)
+        return {'success': True, 'calendar': self.calendars[calendar_id]}
+
+    def update_calendar(self, request, calendar_id):
+        if calendar_id not in self.calendars:
+            return _error(404)
+        body = _json_body(request)
+        body.pop('id', None)
+        self.calendars[calendar_id].update(body)
+        return {'success': True, 'calendar': self.calendars[calendar_id]}
+
+    def delete_calendar(self, request, calendar_id):
+        calendar_row = self.calendars.pop(calendar_id, None)
+        if calendar_row is None:
+            return _error(404)
+        for task_id in [task_id for task_id, task in self.tasks.items()
+                        if task['calendar_id'] == calendar_id]:
+            del self.tasks[task_id]
+            self.touch(task_id, calendar_id)
+        return {'success': True, 'name': calendar_row['name']}
+
+    def month_tasks(self, request, calendar_id):
+        if calendar_id not in self.calendars:
+            return _error(404)
+        now = datetime.now()
+        year = request.args.get('y', now.year, type=int)
+        month = request.args.get('m', now.month, type=int)
+        if not 1 <= month <= 12:
+            return _error(422)
+        prefix = '%04d-%02d-' % (year, month)
+
+        def in_month(task):
+            return task['is_recurrent'] or \
+                task['start_time'].startswith(prefix)
+
+        # The version of the data sent, for the next delta sync
+        headers = {'X-Sync-Version': str(self.version)}
+        since = request.args.get('since', type=int)
+        if since is not None and since <= self.version:
+            with self._lock:
+                self.deltas += 1
+            changed = []
+            deleted = [
+                task_id for task_id, (task_calendar, version)
+                in self.deleted.items()
+                if task_calendar == calendar_id and version > since]
+            for task_id, version in self.task_versions.items():
+                task = self.tasks[task_id]
+                if version <= since or task['calendar_id'] != calendar_id:
+                    continue
+                if in_month(task):
+                    changed.append(task)
+                else:
+                    # Moved to another month
+                    deleted.append(task_id)
+            return {
+                'success': True,
+                'year': year,
+                'month': month,
+                'calendar': self.calendars[calendar_id],
+                'since': since,
+                'changed': changed,
+                'deleted': deleted
+            }, headers
+
+        tasks = [
+            task for task in self.tasks.values()
+            if task['calendar_id'] == calendar_id and in_month(task)
+        ]
+        return {
+            'success': True,
+            'year': year,
+            'month': month,
+            'calendar': self.calendars[calendar_id],
+            'tasks': tasks
+        }, headers
+
+    def create_task(self, request):
+        body = _json_body(request)
+        calendar_id = int(body.get('calendar_id', 0))
+        if calendar_id not in self.calendars:
+            return _error(404)
+        return {'success': True, 'task_id': self.add_task(calendar_id, body)}
+
+    def get_task(self, request, task_id):
+        task = self.tasks.get(task_id)
+        if task is None:
+            return _error(404)
+        return {
+            'success': True,
+            'task': dict(task),
+            'calendar': self.calendars[task['calendar_id']]
+        }
+
+    def update_task(self, request, task_id):
+        task = self.tasks.get(task_id)
+        if task is None:
+            return _error(404)
+        body = _json_body(request)
+        new_day = int(body.pop('newDay', 0) or 0)
+        if new_day:
+            for key in ('start_time', 'end_time'):
+                value = datetime.strptime(task[key], TIME_FORMAT)
+                last_day = calendar.monthrange(value.year, value.month)[1]
+                if new_day > last_day:
+                    return _error(422)
+                task[key] = value.replace(day=new_day).strftime(TIME_FORMAT)
+        body.pop('id', None)
+        task.update(body)
+        self.touch(task_id, task['calendar_id'])
+        return {'success': True, 'task_id': task_id}
+
+    def delete_task(self, request, task_id):
+        task = self.tasks.pop(task_id, None)
+        if task is None:
+            return _error(404)
+        self.touch(task_id, task['calendar_id'])
+        return {'success': True, 'task_id': task_id}
+
+    # WSGI
+
+    def dispatch(self, request):
+        for method, pattern, view in self.routes:
+            match = re.match(pattern, request.path)
+            if match and request.method == method:
+                args = [int(group) for group in match.groups()]
+                return view(request, *args)
+        return _error(404)
+
+    def __call__(self, environ, start_response):
+        request = Request(environ)
+        with self._lock:
+            self.requests += 1
+        headers = {}
+        try:
+            body = self.dispatch(request)
+        except (ValueError, TypeError, KeyError):
+            body = _error(422)
+        if isinstance(body, tuple):
+            body, headers = body
+        response = Response(
+            json.dumps(body), mimetype='application/json', headers=headers)
+        if request.method == 'GET':
+            # Strong ETag of the body, conditional GETs get a 304
+            response.add_etag()
+            response.make_conditional(request)
+            if response.status_code == 304:
+                with self._lock:
+                    self.not_modified += 1
+        return response(environ, start_response)
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+'''
+StubServer
+    runs a StubBackend in a background thread on a free local port
+'''
+
+
+class StubServer():
+    def __init__(self, backend=None, host='127.0.0.1', port=0):
+        self.backend = backend or StubBackend()
+        self.server = make_server(
+            host, port, self.backend, threaded=True,
+            request_handler=QuietRequestHandler)
+        self.host, self.port = self.server.server_address[:2]
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://%s:%d/' % (self.host, self.port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--tasks', type=int, default=200)
+    parser.add_argument('--seed-file',
+                        help='JSONL file the tasks are seeded from')
+    args = parser.parse_args()
+
+    backend = StubBackend()
+    calendar_id = backend.add_calendar('Stub calendar')
+    now = datetime.now()
+    if args.seed_file:
+        backend.seed_from_jsonl(
+            calendar_id, args.seed_file, now.year, now.month)
+    else:
+        backend.seed(calendar_id, args.tasks, now.year, now.month)
+    server = StubServer(backend, args.host, args.port)
+    print('API_URL=%s (%d tasks)' % (server.url, len(backend.tasks)))
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+""" Synthetic backend payloads shared by the stub backend and benchmarks """
+import calendar
+import random
+
+TIME_FORMAT = '%Y-%m-%d, %H:%M:%S'
+
+# Relative weight of every kind of task: (is_recurrent, type, subtype)
+DEFAULT_MIX = (
+    ((False, '', ''), 4),
+    ((True, 'w', ''), 3),
+    ((True, 'm', 'w'), 1),
+    ((True, 'm', 'm'), 2),
+)
+
+
+def synthetic_tasks(count, year, month, mix=DEFAULT_MIX, seed=0,
+                    calendar_id=1):
+    rng = random.Random(seed)
+    kinds = [kind for kind, _ in mix]
+    weights = [weight for _, weight in mix]
+    last_day = calendar.monthrange(year, month)[1]
+    tasks = []
+    for task_id in range(1, count + 1):
+        is_recurrent, repetition_type, repetition_subtype = rng.choices(
+            kinds, weights)[0]
+        day = rng.randint(1, last_day)
+        hour = rng.randint(0, 22)
+        minute = rng.choice((0, 15, 30, 45))
+        if repetition_type == 'w' or repetition_subtype == 'w':
+            repetition_value = rng.randint(0, 6)
+        elif repetition_subtype == 'm':
+            repetition_value = rng.randint(1, 31)
+        else:
+            repetition_value = 0
+        tasks.append({
+            'id': task_id,
+            'calendar_id': calendar_id,
+            'title': 'Task %d' % task_id,
+            'color': '#3EB34F',
+            'details': 'Details of task %d, see https://example.com/t/%d'
+                       % (task_id, task_id),
+            'start_time': '%04d-%02d-%02d, %02d:%02d:00'
+                          % (year, month, day, hour, minute),
+            'end_time': '%04d-%02d-%02d, %02d:%02d:00'
+                        % (year, month, day, hour + 1, minute),
+            'is_all_day': rng.random() < 0.3,
+            'is_recurrent': is_recurrent,
+            'repetition_type': repetition_type,
+            'repetition_subtype': repetition_subtype,
+            'repetition_value': repetition_value
+        })
+    return tasks
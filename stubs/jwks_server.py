@@ -0,0 +1,219 @@
+""" Local JWKS stub server
+
+Publishes a freshly generated RSA signing key on /.well-known/jwks.json so
+the JWT verification of the frontend can be exercised offline, and signs
+tokens that the frontend accepts.
+
+    python -m stubs.jwks_server --port 8765
+
+then start the frontend with:
+
+    export JWKS_URL=http://127.0.0.1:8765/.well-known/jwks.json
+    export AUTH0_DOMAIN=127.0.0.1:8765 ALGORITHMS=RS256 API_AUDIENCE=calendar
+
+To check that the frontend verifies the signed tokens, including a key
+rotation and an unreachable endpoint:
+
+    python -m stubs.jwks_server --check
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwt
+
+
+def _b64_uint(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+class SigningKey():
+    def __init__(self, kid):
+        self.kid = kid
+        self._key = rsa.generate_private_key(
+            public_exponent=65537, key_size=2048, backend=default_backend())
+
+    def jwk(self):
+        numbers = self._key.public_key().public_numbers()
+        return {
+            'alg': 'RS256',
+            'kty': 'RSA',
+            'use': 'sig',
+            'kid': self.kid,
+            'n': _b64_uint(numbers.n),
+            'e': _b64_uint(numbers.e)
+        }
+
+    def private_pem(self):
+        return self._key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.TraditionalOpenSSL,
+            encryption_algorithm=serialization.NoEncryption()
+        )
+
+
+class JWKSStub():
+    def __init__(self, host='127.0.0.1', port=0, kid='stub-key-1'):
+        self.keys = [SigningKey(kid)]
+        self.fetches = 0
+        # Fetches answered with a 503 included
+        self.requests = 0
+        self.available = True
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/.well-known/jwks.json':
+                    self.send_error(404)
+                    return
+                stub.requests += 1
+                if not stub.available:
+                    self.send_error(503)
+                    return
+                stub.fetches += 1
+                body = json.dumps({
+                    'keys': [key.jwk() for key in stub.keys]
+                }).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.host, self.port = self.server.server_address[:2]
+
+    @property
+    def domain(self):
+        return '%s:%d' % (self.host, self.port)
+
+    @property
+    def url(self):
+        return 'http://%s/.well-known/jwks.json' % self.domain
+
+    def rotate(self, kid):
+        self.keys.insert(0, SigningKey(kid))
+
+    def sign(self, audience='calendar', permissions=(), expires_in=3600,
+             issuer=None, kid=None):
+        key = self.keys[0] if kid is None else \
+            next(k for k in self.keys if k.kid == kid)
+        now = int(time.time())
+        claims = {
+            'iss': issuer or 'https://%s/' % self.domain,
+            'sub': 'stub|user',
+            'aud': audience,
+            'iat': now,
+            'exp': now + expires_in,
+            'permissions': list(permissions)
+        }
+        return jwt.encode(
+            claims, key.private_pem(), algorithm='RS256',
+            headers={'kid': key.kid})
+
+    def start(self):
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def check(stub, audience):
+    """Verifies tokens signed by stub with app.mod_auth.auth, returns the
+    failed checks."""
+    os.environ.update(
+        JWKS_URL=stub.url, AUTH0_DOMAIN=stub.domain, ALGORITHMS='RS256',
+        API_AUDIENCE=audience, JWKS_MIN_REFRESH_INTERVAL='60')
+    from app.mod_auth import auth
+
+    def verifies(token):
+        try:
+            return auth.verify_decode_jwt(token)['sub'] == 'stub|user'
+        except auth.AuthError as e:
+            print(e.error)
+            return False
+
+    def rejected(token, code):
+        try:
+            auth.verify_decode_jwt(token)
+        except auth.AuthError as e:
+            return e.error['code'] == code
+        return False
+
+    failed = []
+    if not verifies(stub.sign(audience=audience)):
+        failed.append('signed token')
+    if not rejected(stub.sign(audience=audience, expires_in=-10),
+                    'token_expired'):
+        failed.append('expired token')
+    if not rejected(stub.sign(audience='other'), 'invalid_claims'):
+        failed.append('audience')
+    # A new kid is fetched at once, the first time
+    auth.jwks_cache._attempted_at = None
+    stub.rotate('stub-key-2')
+    if not verifies(stub.sign(audience=audience)):
+        failed.append('rotated key')
+    # Unknown kids do not refetch a down endpoint until the interval ends
+    stub.available = False
+    auth.jwks_cache._attempted_at = None
+    stub.rotate('stub-key-3')
+    requests = stub.requests
+    for _ in range(5):
+        rejected(stub.sign(audience=audience), 'invalid_header')
+    stub.available = True
+    stub.rotate('stub-key-4')
+    rejected(stub.sign(audience=audience), 'invalid_header')
+    if stub.requests != requests + 1:
+        failed.append('refetch backoff')
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--audience', default='calendar')
+    parser.add_argument('--check', action='store_true',
+                        help='verify signed tokens with the frontend')
+    args = parser.parse_args()
+
+    if args.check:
+        stub = JWKSStub(args.host, 0).start()
+        try:
+            failed = check(stub, args.audience)
+        finally:
+            stub.stop()
+        if failed:
+            sys.exit('Failed: %s' % ', '.join(failed))
+        print('Signed tokens verified')
+        return
+
+    stub = JWKSStub(args.host, args.port)
+    print('JWKS_URL=%s' % stub.url)
+    print('Sample token: %s' % stub.sign(
+        audience=args.audience,
+        permissions=['get:calendars', 'get:tasks']))
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()